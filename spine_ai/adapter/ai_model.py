@@ -1,25 +1,185 @@
-import ollama
+import time
+import threading
 
 class AIModel:
-    def __init__(self, model_name='tinyllama'):
+    def __init__(self, model_name='tinyllama', host=None, timeout=120.0, connect_timeout=5.0,
+                 keep_alive='30m', max_connections=4, cache=None, cache_max_temperature=None, options=None):
+        """
+        Ollama model wrapper with one long-lived, pooled HTTP client
+        
+        Args:
+            model_name: Ollama model name
+            host: Ollama server URL (None = OLLAMA_HOST or http://localhost:11434)
+            timeout: Seconds to wait for each piece of a response (None = no limit).
+                     Responses are always read as a stream, so a long answer
+                     never runs into it, only a server that stops sending.
+            connect_timeout: Seconds to wait for the connection itself
+            keep_alive: How long the server keeps the model loaded after a call
+                        (e.g. '30m', -1 = forever, 0 = unload right away)
+            max_connections: Size of the connection pool
+            cache: Optional ResponseCache for repeated identical requests
+            cache_max_temperature: Cache every call at or below this temperature
+                                   (None = only calls made with cache=True)
+            options: Ollama options sent with every call unless the call sets
+                     them (e.g. {'num_ctx': 1024}), anything unset is left to
+                     the server's defaults
+        """
         self.model_name = model_name
+        self.keep_alive = keep_alive
+        self.host = host
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.cache = cache
+        self.cache_max_temperature = cache_max_temperature
+        self.options = dict(options or {})
+
+    @property
+    def client(self):
+        """The pooled Ollama client, created on first use (importing ollama takes ~0.5 s)"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import httpx
+                    import ollama
+                    # Connections are reused across calls instead of being opened per request
+                    self._client = ollama.Client(
+                        host=self.host,
+                        timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                        limits=httpx.Limits(max_connections=self.max_connections,
+                                            max_keepalive_connections=self.max_connections)
+                    )
+        return self._client
+    
+    @client.setter
+    def client(self, client):
+        self._client = client
+    
+    def _options(self, **options):
+        """Options for one call: the model's defaults plus what the caller set (None = not set)"""
+        merged = dict(self.options)
+        merged.update((name, value) for name, value in options.items() if value is not None)
+        return merged
+    
+    def _use_cache(self, cache, options):
+        if self.cache is None or cache is False:
+            return False
+        if cache:
+            return True
+        # Without a temperature the server's default (0.8) applies, too random to cache
+        temperature = options.get('temperature')
+        return (self.cache_max_temperature is not None and temperature is not None
+                and temperature <= self.cache_max_temperature)
 
-    def generate(self, prompt, temperature=0.7, num_ctx=1024, max_tokens=150, stop=None, top_p=0.9):
+    def generate(self, prompt, temperature=None, num_ctx=None, max_tokens=None, stop=None, top_p=None,
+                 cache=None):
+        """
+        Generate a full response
+        
+        Options left as None are not sent, so the server (or self.options)
+        decides them. max_tokens caps the answer (Ollama's num_predict).
+        
+        Args:
+            cache: True/False to force the response cache on/off for this
+                   call (None = decide by cache_max_temperature)
+        """
+        options = self._options(temperature=temperature, num_ctx=num_ctx, num_predict=max_tokens, stop=stop,
+                                top_p=top_p)
+        use_cache = self._use_cache(cache, options)
+        if use_cache:
+            cached = self.cache.get(self.model_name, prompt, options)
+            if cached is not None:
+                return cached
+        
+        model_name = self.model_name
         try:
-            response = ollama.generate(
-                model=self.model_name,
+            # Streamed and joined, so the timeout applies per piece, not to the whole answer
+            stream = self.client.generate(
+                model=model_name,
                 prompt=prompt,
-                options={
-                    'temperature': temperature,
-                    'num_ctx': num_ctx,
-                    'max_tokens': max_tokens,
-                    'stop': stop,
-                    'top_p': top_p
-                }
+                stream=True,
+                keep_alive=self.keep_alive,
+                options=options
             )
-            return response['response']
+            parts = []
+            try:
+                for part in stream:
+                    parts.append(part['response'])
+                    if part.get('done'):
+                        break
+            finally:
+                stream.close()
         except Exception as e:
             return f"Error: {e}"
+        
+        response = "".join(parts)
+        if use_cache:
+            self.cache.put(model_name, prompt, options, response)
+        return response
+    
+    def generate_stream(self, prompt, temperature=None, num_ctx=None, max_tokens=None, stop=None, top_p=None,
+                        cache=None):
+        """
+        Generate a response piece by piece as Ollama produces it
+        
+        A cached response comes back as a single chunk. A streamed response
+        is only cached once it has been read to the end. Closing the
+        generator early closes the HTTP response, and Ollama stops
+        decoding as soon as its client goes away.
+        
+        Yields:
+            Text chunks (usually a token or two each). Errors are raised,
+            not returned as text, so callers can tell them from output.
+        """
+        options = self._options(temperature=temperature, num_ctx=num_ctx, num_predict=max_tokens, stop=stop,
+                                top_p=top_p)
+        use_cache = self._use_cache(cache, options)
+        if use_cache:
+            cached = self.cache.get(self.model_name, prompt, options)
+            if cached is not None:
+                yield cached
+                return
+        
+        model_name = self.model_name
+        stream = self.client.generate(
+            model=model_name,
+            prompt=prompt,
+            stream=True,
+            keep_alive=self.keep_alive,
+            options=options
+        )
+        parts = []
+        try:
+            for part in stream:
+                if part['response']:
+                    parts.append(part['response'])
+                    yield part['response']
+                if part.get('done'):
+                    break
+        finally:
+            stream.close()
+        
+        if use_cache:
+            self.cache.put(model_name, prompt, options, "".join(parts))
+    
+    def warm_up(self, model_name=None):
+        """
+        Load a model into Ollama's memory without generating anything
+        
+        An empty prompt only loads the model, and keep_alive keeps it
+        resident, so the first real request skips the load. Blocks for
+        the whole load, call it from a worker thread.
+        
+        Returns:
+            Seconds the load took (near zero if it was already loaded)
+        """
+        start = time.perf_counter()
+        # Same default options as the calls that follow, a different num_ctx would reload the model
+        self.client.generate(model=model_name or self.model_name, prompt='', keep_alive=self.keep_alive,
+                             options=self.options or None)
+        return time.perf_counter() - start
     
     def change_model(self, model_name):
         """Change the current model"""
@@ -33,12 +193,12 @@ class AIModel:
     def list_models(self):
         """List available models correctly"""
         try:
-            models_response = ollama.list()
+            models_response = self.client.list()
             # Inspect the response structure
             # Example response: {'models': [{'name': 'tinyllama'}, {'name': 'gemma:2b'}]}
             models = models_response.get('models', [])
-            # Extract model names
-            return [model.get('name', 'Unknown') for model in models]
+            # Extract model names (newer ollama clients call the field 'model')
+            return [model.get('model') or model.get('name') or 'Unknown' for model in models]
         except Exception as e:
             return f"Error: {e}"
 
@@ -0,0 +1,302 @@
+import os
+import re
+import json
+import math
+import sqlite3
+import tempfile
+from collections import Counter
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser("~"), ".spine_ai", "chat_history.db")
+
+SEARCH_WINDOW = 200  # newest matches ranked per search
+DF_SAMPLE = 200  # newest matches used to estimate how common a word is
+MAX_SEARCH_WORDS = 8
+PREFIX_INDEX = (2, 4)  # prefix lengths with their own FTS5 index (prefix='2 3 4')
+MAX_COMPLETIONS = 32  # words a longer prefix is expanded to
+BM25_K1 = 1.2
+BM25_B = 0.75
+PREFIX_WEIGHT = 0.5  # a completion of the last word counts half as much as the word itself
+
+# Same word boundaries as FTS5's unicode61 tokenizer (underscore separates words)
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+class ChatHistoryStore:
+    def __init__(self, path=None):
+        """
+        SQLite store behind the chat view
+        
+        Every message is written here when it is shown, so the view can
+        drop old rows from memory and page them back in on demand. An FTS5
+        index over the message text, kept in sync by triggers, serves
+        search() without scanning the table.
+        
+        Args:
+            path: Database file (None = a temporary file removed on close)
+        """
+        self.temporary = path is None
+        if path is None:
+            handle, path = tempfile.mkstemp(prefix="spine_ai_chat_", suffix=".db")
+            os.close(handle)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        
+        self.db = sqlite3.connect(path)
+        # WAL without a sync per commit keeps appends cheap, a crash loses at most the last few messages
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, prefix TEXT NOT NULL, "
+            "text TEXT NOT NULL, data TEXT)"
+        )
+        # Every word seen, so a typed prefix can be expanded to whole words
+        self.db.execute("CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY) WITHOUT ROWID")
+        self._create_search_index()
+        self.db.commit()
+    
+    def _create_search_index(self):
+        exists = self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+        ).fetchone()
+        if exists:
+            return
+        
+        # External content table: the text lives once, in messages
+        self.db.execute(
+            "CREATE VIRTUAL TABLE messages_fts USING fts5("
+            "text, content='messages', content_rowid='id', prefix='2 3 4', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        self.db.executescript("""
+            CREATE TRIGGER messages_ai AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text);
+            END;
+            CREATE TRIGGER messages_ad AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            END;
+            CREATE TRIGGER messages_au AFTER UPDATE OF text ON messages BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text);
+            END;
+        """)
+        # Messages stored before the index existed
+        self.db.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+        for (text,) in self.db.execute("SELECT text FROM messages").fetchall():
+            self._add_terms(text)
+    
+    def _add_terms(self, text):
+        words = set(WORD_PATTERN.findall(text.lower()))
+        if words:
+            self.db.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", [(word,) for word in words])
+    
+    def add(self, kind, text, prefix="", data=None):
+        """
+        Store a message
+        
+        Args:
+            kind: user, ai, system or sources
+            text: Message text
+            prefix: Sender label shown in front of the text (e.g. "🤖 AI")
+            data: Extra JSON-serializable payload (the source list for sources messages)
+        
+        Returns:
+            Message id, ids grow in display order
+        """
+        cursor = self.db.execute(
+            "INSERT INTO messages (kind, prefix, text, data) VALUES (?, ?, ?, ?)",
+            (kind, prefix, text, json.dumps(data) if data is not None else None)
+        )
+        self._add_terms(text)
+        self.db.commit()
+        return cursor.lastrowid
+    
+    def update_text(self, message_id, text):
+        """Replace a message's text (a streamed answer is stored once it is complete)"""
+        self.db.execute("UPDATE messages SET text = ? WHERE id = ?", (text, message_id))
+        self._add_terms(text)
+        self.db.commit()
+    
+    def append_text(self, message_id, text):
+        """Add streamed text to a stored message (used when its row is not in memory)"""
+        self.db.execute("UPDATE messages SET text = text || ? WHERE id = ?", (text, message_id))
+        # Whole text, a word can be split across streamed chunks
+        row = self.db.execute("SELECT text FROM messages WHERE id = ?", (message_id,)).fetchone()
+        if row:
+            self._add_terms(row[0])
+        self.db.commit()
+    
+    def load_before(self, message_id, limit):
+        """
+        Messages older than message_id (None = the newest ones)
+        
+        Returns:
+            Up to limit message dicts, oldest first
+        """
+        if message_id is None:
+            rows = self.db.execute(
+                "SELECT id, kind, prefix, text, data FROM messages ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        else:
+            rows = self.db.execute(
+                "SELECT id, kind, prefix, text, data FROM messages WHERE id < ? ORDER BY id DESC LIMIT ?",
+                (message_id, limit)
+            ).fetchall()
+        return [self._to_message(row) for row in reversed(rows)]
+    
+    def load_after(self, message_id, limit):
+        """
+        Messages newer than message_id
+        
+        Returns:
+            Up to limit message dicts, oldest first
+        """
+        rows = self.db.execute(
+            "SELECT id, kind, prefix, text, data FROM messages WHERE id > ? ORDER BY id LIMIT ?",
+            (message_id, limit)
+        ).fetchall()
+        return [self._to_message(row) for row in rows]
+    
+    def has_before(self, message_id):
+        return self.db.execute("SELECT 1 FROM messages WHERE id < ? LIMIT 1", (message_id,)).fetchone() is not None
+    
+    def has_after(self, message_id):
+        return self.db.execute("SELECT 1 FROM messages WHERE id > ? LIMIT 1", (message_id,)).fetchone() is not None
+    
+    def search(self, query, limit=20):
+        """
+        Full-text search over all stored messages
+        
+        Every word has to match, the last one also as a prefix, so results
+        can be shown while the user is still typing. Only the newest
+        SEARCH_WINDOW matches are ranked: SQLite's bm25() reads every
+        posting of every query word to count documents, which takes
+        hundreds of ms for common words in a large history. Here BM25 is
+        computed over the window instead, with document counts estimated
+        from how densely each word's newest matches are spread.
+        
+        Args:
+            query: Words to look for (FTS5 operators are not interpreted)
+            limit: Maximum number of hits
+        
+        Returns:
+            Hits as {'id', 'kind', 'snippet', 'score'}, best match first
+        """
+        words = WORD_PATTERN.findall(query.lower())[:MAX_SEARCH_WORDS]
+        if not words:
+            return []
+        terms = [self._term_expression(word, index == len(words) - 1) for index, word in enumerate(words)]
+        ids = self._newest_matches(terms, SEARCH_WINDOW)
+        if not ids:
+            return []
+        exact = [f'"{word}"' for word in words]
+        if exact != terms:
+            # Older exact matches would otherwise be crowded out by newer completions
+            ids = sorted(set(ids) | set(self._newest_matches(exact, SEARCH_WINDOW)), reverse=True)
+        
+        marks = ",".join("?" * len(ids))
+        rows = self.db.execute(f"SELECT id, kind, text FROM messages WHERE id IN ({marks})", ids).fetchall()
+        newest = self.db.execute("SELECT MAX(id) FROM messages").fetchone()[0]
+        # A one-word query's window is already that word's newest matches
+        idfs = [self._idf(term, newest, ids if len(terms) == 1 else None) for term in terms]
+        
+        documents = []
+        for message_id, kind, text in rows:
+            counts = Counter(WORD_PATTERN.findall(text.lower()))
+            documents.append((message_id, kind, text, counts, sum(counts.values())))
+        average_length = sum(document[4] for document in documents) / len(documents) or 1
+        
+        scored = []
+        for message_id, kind, text, counts, length in documents:
+            score = 0.0
+            for index, (word, idf) in enumerate(zip(words, idfs)):
+                frequency = counts.get(word, 0)
+                if index == len(words) - 1:
+                    completions = sum(count for token, count in counts.items() if token.startswith(word))
+                    frequency += PREFIX_WEIGHT * (completions - frequency)
+                    # FTS5 folds diacritics, a message it matched has the word at least once
+                    frequency = max(frequency, PREFIX_WEIGHT)
+                else:
+                    frequency = max(frequency, 1)
+                score += idf * frequency * (BM25_K1 + 1) / (
+                    frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                )
+            scored.append((score, message_id, kind, text))
+        
+        # Newer messages first among equal scores
+        scored.sort(reverse=True)
+        return [
+            {'id': message_id, 'kind': kind, 'snippet': self._snippet(text, words), 'score': score}
+            for score, message_id, kind, text in scored[:limit]
+        ]
+    
+    def _term_expression(self, word, prefix):
+        """FTS5 query for one word (quoted, so words like AND/NEAR are not read as operators)"""
+        if not prefix or len(word) < PREFIX_INDEX[0]:
+            # A one-letter prefix matches most of the history, it is taken as a word
+            return f'"{word}"'
+        if len(word) <= PREFIX_INDEX[1]:
+            return f'"{word}"*'
+        # FTS5 merges every posting of a longer prefix before LIMIT applies,
+        # an OR of the known whole words is read lazily instead
+        completions = [row[0] for row in self.db.execute(
+            "SELECT term FROM terms WHERE term >= ? AND term < ? LIMIT ?",
+            (word, word + "\U0010ffff", MAX_COMPLETIONS)
+        )]
+        if not completions:
+            return f'"{word}"'
+        return "(" + " OR ".join(f'"{completion}"' for completion in completions) + ")"
+    
+    def _newest_matches(self, terms, limit):
+        rows = self.db.execute(
+            "SELECT rowid FROM messages_fts WHERE messages_fts MATCH ? ORDER BY rowid DESC LIMIT ?",
+            (" AND ".join(terms), limit)
+        ).fetchall()
+        return [row[0] for row in rows]
+    
+    def _idf(self, term, newest, sample=None):
+        if sample is None:
+            sample = self._newest_matches([term], DF_SAMPLE)
+        sample = sample[:DF_SAMPLE]
+        if len(sample) < DF_SAMPLE:
+            matches = len(sample)  # rare word, counted exactly
+        else:
+            # DF_SAMPLE matches spread over the newest messages, extrapolated to all of them
+            matches = DF_SAMPLE * newest / (newest - sample[-1] + 1)
+        return math.log((newest - matches + 0.5) / (matches + 0.5) + 1)
+    
+    def _snippet(self, text, words, width=100):
+        pattern = r"\b(?:" + "|".join(re.escape(word) for word in words) + r")"
+        found = re.search(pattern, text, re.IGNORECASE)
+        start = max(found.start() - width // 3, 0) if found else 0
+        snippet = " ".join(text[start:start + width].split())
+        if start > 0:
+            snippet = "…" + snippet
+        if start + width < len(text):
+            snippet += "…"
+        return snippet
+    
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    
+    def _to_message(self, row):
+        message_id, kind, prefix, text, data = row
+        return {
+            'id': message_id,
+            'kind': kind,
+            'prefix': prefix,
+            'text': text,
+            'data': json.loads(data) if data else None
+        }
+    
+    def close(self):
+        if self.db is None:
+            return
+        self.db.close()
+        self.db = None
+        if self.temporary:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(self.path + suffix)
+                except OSError:
+                    pass
@@ -0,0 +1,193 @@
+import threading
+
+SUMMARY_PROMPT = """Summarize this conversation between a user and an AI assistant in at most {words} words.
+Keep names, numbers, facts the user shared, decisions and open questions. Write plain sentences.
+
+{previous}Conversation:
+{turns}
+
+Summary:"""
+
+RETAIN_FRACTION = 0.6  # share of the history budget left verbatim after older turns are moved out
+SUMMARY_TEMPERATURE = 0.2
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English with Llama-style tokenizers)"""
+    return (len(text) + 3) // 4
+
+
+class ConversationMemory:
+    def __init__(self, llm, system_prompt="You are a helpful AI assistant.", context_tokens=1024,
+                 answer_tokens=200, summary_tokens=150, message_tokens=150, count_tokens=estimate_tokens):
+        """
+        Conversation context for chat prompts, kept under a fixed token budget
+        
+        Recent turns are sent verbatim. Once they outgrow the history budget,
+        the oldest ones are moved out in one batch and folded into a running
+        summary by a separate LLM call (summary_request()/apply_summary(), or
+        summarize_pending() on a thread), so a prompt never grows past
+        context_tokens - answer_tokens however long the chat runs. Moving
+        turns out in batches also keeps the start of the prompt unchanged
+        between summaries, which lets Ollama reuse its cached prefix and
+        only prefill the new turns.
+        
+        Args:
+            llm: AIModel used by summarize_pending()
+            system_prompt: First line of every prompt
+            context_tokens: Context window the prompts must fit (num_ctx)
+            answer_tokens: Room left for the answer, pass it as max_tokens so the answer is capped to it
+            summary_tokens: Longest running summary (also the summary call's max_tokens)
+            message_tokens: Room kept for the new message when sizing the history
+            count_tokens: Function text -> tokens (estimate_tokens by default)
+        """
+        self.llm = llm
+        self.system_prompt = system_prompt
+        self.context_tokens = context_tokens
+        self.answer_tokens = answer_tokens
+        self.summary_tokens = summary_tokens
+        self.count_tokens = count_tokens
+        # Ends the answer before the model starts writing the user's next line
+        self.stop = ["\nUser:"]
+        self.history_tokens = max(
+            context_tokens - answer_tokens - summary_tokens - message_tokens - count_tokens(system_prompt), 0
+        )
+        
+        self.turns = []  # recent turns: {'role', 'text', 'tokens'}, oldest first
+        self.pending = []  # turns moved out of the history, not yet in the summary
+        self.summarizing = []  # the part of pending a summary call is working on
+        self.summary = ""
+        self.lock = threading.Lock()
+        
+        # Size of the last prompt, for logging
+        self.last_prompt_tokens = 0
+        self.summaries = 0
+    
+    def _turn(self, role, text):
+        line = f"{'User' if role == 'user' else 'Assistant'}: {text.strip()}"
+        return {'role': role, 'text': line, 'tokens': self.count_tokens(line) + 1}
+    
+    def build_prompt(self, message):
+        """
+        Prompt for a new user message: system prompt, summary, recent turns, message
+        
+        Returns:
+            Prompt text
+        """
+        with self.lock:
+            parts = [self.system_prompt]
+            if self.summary:
+                parts.append(f"Summary of the conversation so far: {self.summary}")
+            current = self._turn('user', message)
+            
+            # Newest turns first, as many as fit next to the message and the answer
+            budget = self.context_tokens - self.answer_tokens - current['tokens'] - 2
+            budget -= sum(self.count_tokens(part) for part in parts)
+            recent = []
+            for turn in reversed(self.turns):
+                if turn['tokens'] > budget:
+                    break
+                budget -= turn['tokens']
+                recent.insert(0, turn)
+            # An answer without its question only confuses the model
+            if recent and recent[0]['role'] != 'user':
+                recent.pop(0)
+        
+        if recent:
+            parts.append("\n".join(turn['text'] for turn in recent))
+        parts.append(f"{current['text']}\nAssistant:")
+        prompt = "\n\n".join(parts)
+        self.last_prompt_tokens = self.count_tokens(prompt)
+        return prompt
+    
+    def add_exchange(self, message, answer):
+        """
+        Remember a user message and the answer it got
+        
+        Returns:
+            True if older turns are waiting to be summarized
+        """
+        with self.lock:
+            self.turns.append(self._turn('user', message))
+            self.turns.append(self._turn('assistant', answer))
+            
+            if sum(turn['tokens'] for turn in self.turns) > self.history_tokens:
+                # Move out a batch of whole exchanges at once, so summaries (and prefix changes) stay rare
+                keep = self.history_tokens * RETAIN_FRACTION
+                while self.turns and sum(turn['tokens'] for turn in self.turns) > keep:
+                    self.pending.append(self.turns.pop(0))
+                    while self.turns and self.turns[0]['role'] != 'user':
+                        self.pending.append(self.turns.pop(0))
+            return bool(self.pending)
+    
+    def summary_request(self):
+        """
+        Start folding the pending turns into the summary
+        
+        Returns:
+            (turns, prompt) for the summary call, or None if there is
+            nothing to summarize or a summary call is already running
+        """
+        with self.lock:
+            if not self.pending or self.summarizing:
+                return None
+            # Each turn is capped, so one huge answer cannot overflow the summary call
+            limit = self.history_tokens * 4
+            self.summarizing = list(self.pending)
+            turns = "\n".join(turn['text'][:limit] for turn in self.summarizing)
+            previous = f"Summary so far: {self.summary}\n\n" if self.summary else ""
+            prompt = SUMMARY_PROMPT.format(words=int(self.summary_tokens * 0.75), previous=previous, turns=turns)
+            return self.summarizing, prompt
+    
+    def apply_summary(self, turns, summary):
+        """Replace the summary with the result of a summary_request() call"""
+        summary = " ".join((summary or "").split())
+        if not summary or summary.startswith("Error:"):
+            self.summary_failed(turns)
+            return
+        
+        with self.lock:
+            # A summary that ignored its word limit is cut, the prompt budget depends on it
+            while self.count_tokens(summary) > self.summary_tokens:
+                summary = summary[:len(summary) * self.summary_tokens // self.count_tokens(summary)]
+            self.summary = summary
+            done = {id(turn) for turn in turns}
+            self.pending = [turn for turn in self.pending if id(turn) not in done]
+            self.summarizing = []
+            self.summaries += 1
+    
+    def summary_failed(self, turns):
+        """Keep the turns pending for the next attempt (only the newest ones if they pile up)"""
+        with self.lock:
+            self.summarizing = []
+            while sum(turn['tokens'] for turn in self.pending) > self.history_tokens * 2:
+                self.pending.pop(0)
+    
+    def summarize_pending(self):
+        """Run one summary call with self.llm (blocking)"""
+        request = self.summary_request()
+        if request is None:
+            return
+        turns, prompt = request
+        try:
+            summary = self.llm.generate(
+                prompt=prompt,
+                temperature=SUMMARY_TEMPERATURE,
+                max_tokens=self.summary_tokens
+            )
+        except Exception as e:
+            summary = f"Error: {e}"
+        self.apply_summary(turns, summary)
+    
+    def start_background_summary(self):
+        """Summarize the pending turns on a daemon thread (for scripts without a worker pool)"""
+        thread = threading.Thread(target=self.summarize_pending, daemon=True)
+        thread.start()
+        return thread
+    
+    def clear(self):
+        with self.lock:
+            self.turns = []
+            self.pending = []
+            self.summarizing = []
+            self.summary = ""
@@ -0,0 +1,86 @@
+import os
+import sys
+import threading
+
+# The RAG system lives in v3.0 next to this app
+V3_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'v3.0'))
+if V3_DIR not in sys.path:
+    sys.path.insert(0, V3_DIR)
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.expanduser("~"), ".spine_ai", "rag_index")
+
+class RAGEngine:
+    def __init__(self, model_name='tinyllama', index_dir=DEFAULT_INDEX_DIR, chunk_size=200, overlap=40, llm=None):
+        """
+        Embedding + FAISS engine behind RAG mode (wraps the v3.0 TinyLlamaRAG)
+        
+        The embedding model is only loaded by load(), which the indexing
+        worker calls off the UI thread. Pass the app's AIModel as llm so
+        RAG shares its Ollama client instead of opening another one.
+        """
+        self.model_name = model_name
+        self.llm = llm
+        self.index_dir = index_dir
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.rag = None
+        self._load_lock = threading.Lock()
+        # One upload is indexed at a time, searches still run in between its batches
+        self._ingest_lock = threading.Lock()
+    
+    @property
+    def is_ready(self):
+        return self.rag is not None
+    
+    def load(self):
+        """Load the embedding model and the saved index (slow, keep it off the UI thread)"""
+        with self._load_lock:
+            if self.rag is None:
+                from rag import TinyLlamaRAG
+                rag = TinyLlamaRAG(model_name=self.model_name, index_dir=self.index_dir,
+                                   chunk_unit="tokens", llm=self.llm)
+                rag.load_index()
+                self.rag = rag
+        return self.rag
+    
+    @property
+    def has_vectors(self):
+        return self.rag is not None and self.rag.faiss_index is not None and self.rag.faiss_index.ntotal > 0
+    
+    def set_model(self, model_name):
+        self.model_name = model_name
+        # A shared AIModel is switched by its owner
+        if self.rag is not None and self.llm is None:
+            self.rag.model_name = model_name
+    
+    def add_document(self, file_path, progress_callback=None):
+        """
+        Chunk, embed and index a document, then save the index
+        
+        The index keeps its own copy of the file and reads chunk text from
+        it, so the original can be moved, edited or deleted once it's
+        uploaded and is never kept open. Documents are keyed by their full
+        path: uploading the same path again updates the document (only its
+        edited chunks are embedded), a file with the same name from another
+        folder is indexed next to it. Searches keep running while a
+        document is indexed or updated.
+        
+        Args:
+            file_path: Text file to index
+            progress_callback: Optional function(bytes_done, bytes_total), raising from it cancels
+        
+        Returns:
+            Number of chunks that were embedded
+        """
+        rag = self.load()
+        with self._ingest_lock:
+            added = rag.add_document(file_path, self.chunk_size, self.overlap,
+                                     progress_callback=progress_callback, name=os.path.abspath(file_path))
+            rag.save_index()
+        return added
+    
+    def search(self, query, top_k=3):
+        """Hybrid search over everything indexed so far"""
+        if not self.has_vectors:
+            return []
+        return self.rag.retrieve_relevant_chunks(query, top_k)
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    def __init__(self, max_entries=256, ttl=24 * 3600, db_path=None, max_disk_entries=10000):
+        """
+        Exact-match cache for LLM responses
+
+        Keys are (model, full prompt, options), so a hit is only possible
+        for a request that is identical to an earlier one. Entries live in
+        an in-memory LRU, and optionally in a SQLite file so they survive
+        restarts. Safe to use from worker threads.
+
+        Args:
+            max_entries: Responses kept in memory (least recently used go first)
+            ttl: Seconds an entry stays valid (None = forever)
+            db_path: SQLite file for the on-disk tier (None = memory only)
+            max_disk_entries: Responses kept on disk (oldest go first)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self.memory = OrderedDict()  # key -> (created_at, response)
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, created_at REAL NOT NULL, response TEXT NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created_at)")
+            self.db.commit()
+
+    @staticmethod
+    def make_key(model, prompt, options):
+        payload = json.dumps([model, prompt, options], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _expired(self, created_at, now):
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, model, prompt, options):
+        """
+        Look up a response
+
+        Returns:
+            The cached response text, or None on a miss
+        """
+        key = self.make_key(model, prompt, options)
+        now = time.time()
+
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self.memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT created_at, response FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if not self._expired(row[0], now):
+                        self._remember(key, row[0], row[1])
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return row[1]
+                    self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, model, prompt, options, response):
+        key = self.make_key(model, prompt, options)
+        now = time.time()
+
+        with self.lock:
+            self._remember(key, now, response)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses (key, created_at, response) VALUES (?, ?, ?)",
+                    (key, now, response)
+                )
+                self.db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+                self.db.commit()
+
+    def _remember(self, key, created_at, response):
+        self.memory[key] = (created_at, response)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses")
+                self.db.commit()
+
+    def stats(self):
+        """Hit/miss counters for logging"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory)
+            }
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
@@ -1,23 +1,58 @@
+import time
 from PySide6.QtCore import QThread, Signal
 
 class AIWorker(QThread):
     response_ready = Signal(str)
     error_occurred = Signal(str)
+    token_received = Signal(str)  # streamed text chunks, in order
+    first_token = Signal(float)  # seconds from request to first token
+    cancelled = Signal(int, int)  # tokens generated, tokens saved (estimated against the max_tokens cap)
     
-    def __init__(self, ai_model, prompt, message_type="chat"):
+    def __init__(self, ai_model, prompt, message_type="chat", stream=True, temperature=0.7, max_tokens=200,
+                 stop=None):
         super().__init__()
         self.ai_model = ai_model
         self.prompt = prompt
         self.message_type = message_type
+        self.stream = stream
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.stop = stop
+        self.created_at = time.perf_counter()
+    
+    def cancel(self):
+        """Stop the generation after the next token (safe to call from the UI thread)"""
+        self.requestInterruption()
     
     def run(self):
         try:
-            # Generate AI response in background thread
-            response = self.ai_model.generate(
+            # Stream tokens as they arrive, the full text follows at the end. Without
+            # stream the tokens are only collected, so a cancel still stops the answer
+            parts = []
+            stream = self.ai_model.generate_stream(
                 prompt=self.prompt,
-                temperature=0.7,
-                max_tokens=200
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stop=self.stop
             )
-            self.response_ready.emit(response)
+            try:
+                for text in stream:
+                    if self.isInterruptionRequested():
+                        break
+                    parts.append(text)
+                    if not self.stream:
+                        continue
+                    if len(parts) == 1:
+                        self.first_token.emit(time.perf_counter() - self.created_at)
+                    self.token_received.emit(text)
+            finally:
+                # Closes the HTTP stream, so Ollama stops decoding a cancelled answer
+                stream.close()
+            
+            if self.isInterruptionRequested():
+                # Stream chunks are about one token each
+                self.cancelled.emit(len(parts), max(self.max_tokens - len(parts), 0))
+                return
+            self.response_ready.emit("".join(parts))
         except Exception as e:
             self.error_occurred.emit(str(e))
@@ -4,21 +4,61 @@ from PySide6.QtCore import QTimer
 from .rag_controller import RAGController
 from .actions_controller import ActionsController
 from .ai_worker import AIWorker
+from .rag_worker import RAGWorker
+from .request_scheduler import RequestScheduler, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from .model_worker import ModelWarmupWorker, ModelListWorker
 from adapter.ai_model import AIModel
+from adapter.response_cache import ResponseCache
+from adapter.conversation_memory import ConversationMemory, SUMMARY_TEMPERATURE
 
 class AppController:
     def __init__(self):
         self.current_model = "tinyllama"
         
-        # Initialize AI Model
-        self.ai_model = AIModel(self.current_model)
+        # Initialize AI Model (RAG answers at temperature 0.3 are cached, chat at 0.7 is not)
+        cache_path = os.path.join(os.path.expanduser("~"), ".spine_ai", "response_cache.db")
+        self.ai_model = AIModel(self.current_model, cache=ResponseCache(db_path=cache_path),
+                                cache_max_temperature=0.3, options={'num_ctx': 1024, 'top_p': 0.9})
         
-        self.rag_controller = RAGController()
+        # Chat prompts carry recent turns plus a running summary, within num_ctx
+        self.memory = ConversationMemory(self.ai_model, context_tokens=self.ai_model.options['num_ctx'])
+        self.summary_requests = {}  # request id -> turns being folded into the summary
+        
+        self.rag_controller = RAGController(self.ai_model)
         self.actions_controller = ActionsController()
         
-        # Keep track of active worker
-        self.current_worker = None
+        # Generations run through the scheduler, at most two hit Ollama at once
+        self.scheduler = RequestScheduler(max_concurrent=2)
+        self.scheduler.retrieval_done.connect(self._on_retrieval_done)
+        self.scheduler.token_received.connect(self._on_token_received)
+        self.scheduler.first_token.connect(self._on_first_token)
+        self.scheduler.response_ready.connect(self._on_chat_response_ready)
+        self.scheduler.error_occurred.connect(self._on_ai_error)
+        self.scheduler.request_cancelled.connect(self._on_request_cancelled)
+        
+        # Warm-up and model list workers, kept alive until they finish
+        self.background_workers = []
+        
+        # Replies are shown in the order the messages were sent; only the
+        # oldest open one streams live, later ones are buffered until its turn
+        self.pending_replies = {}  # request id -> {'chat_widget', 'sources', 'parts', 'done', 'response', 'error', 'cancelled'}
+        self.reply_order = []
         
+        # Time to first token of the latest streamed reply, in seconds
+        self.last_first_token_latency = None
+        
+    def start_background_tasks(self):
+        """Slow start-up work (the saved RAG index pulls in torch and faiss), run once the window is up"""
+        self.rag_controller.load_saved_index()
+    
+    def shutdown(self):
+        """Stop background work and wait for it, so no QThread is destroyed while running"""
+        self.rag_controller.shutdown()
+        self.scheduler.shutdown()
+        for worker in list(self.background_workers):
+            worker.cancel()
+            worker.wait()
+    
     def change_model(self, model_name):
         self.current_model = model_name
         
@@ -29,6 +69,38 @@ class AppController:
         self.rag_controller.set_model(model_name)
         
         print(f"Model changed to: {model_name}")
+        
+        # Load the new model now instead of on the first message
+        return self.warm_up_model(model_name)
+    
+    def warm_up_model(self, model_name=None):
+        """
+        Load a model into Ollama on a background worker
+        
+        Returns:
+            The started ModelWarmupWorker, so the UI can show a loading state
+        """
+        return self._start_background(ModelWarmupWorker(self.ai_model, model_name or self.current_model))
+    
+    def fetch_models(self):
+        """
+        List the installed Ollama models on a background worker
+        
+        Returns:
+            The started ModelListWorker (models_ready carries the names)
+        """
+        return self._start_background(ModelListWorker(self.ai_model))
+    
+    def _start_background(self, worker):
+        worker.finished.connect(lambda: self._on_background_finished(worker))
+        self.background_workers.append(worker)
+        worker.start()
+        return worker
+    
+    def _on_background_finished(self, worker):
+        if worker in self.background_workers:
+            self.background_workers.remove(worker)
+        worker.deleteLater()
     
     def handle_chat_message(self, message):
         window = QApplication.instance().activeWindow()
@@ -36,22 +108,41 @@ class AppController:
         # Show loading indicator immediately
         window.chat_widget.show_ai_thinking()
         
-        # Create and start worker thread
-        prompt = f"You are a helpful AI assistant. Respond naturally to: {message}"
-        self.current_worker = AIWorker(self.ai_model, prompt, "chat")
-        
-        # Connect signals
-        self.current_worker.response_ready.connect(self._on_chat_response_ready)
-        self.current_worker.error_occurred.connect(self._on_ai_error)
-        
-        # Start background processing
-        self.current_worker.start()
+        prompt = self.memory.build_prompt(message)
+        print(f"Chat prompt: ~{self.memory.last_prompt_tokens} tokens")
+        request_id = self.scheduler.submit(
+            lambda: AIWorker(self.ai_model, prompt, "chat", max_tokens=self.memory.answer_tokens,
+                             stop=self.memory.stop),
+            priority=PRIORITY_INTERACTIVE,
+            key=("chat", self.ai_model.model_name, prompt)
+        )
+        self._track_reply(request_id, window.chat_widget, message)
     
     def handle_rag_message(self, message):
-        # For now, keep RAG synchronous - you can make it async later
-        response = self.rag_controller.process_query(message)
         window = QApplication.instance().activeWindow()
-        window.chat_widget.add_ai_message(response)
+        
+        # Same thinking indicator as chat, retrieval and generation run on a worker
+        window.chat_widget.show_ai_thinking()
+        
+        request_id = self.scheduler.submit(
+            lambda: RAGWorker(self.rag_controller, self.ai_model, message),
+            priority=PRIORITY_INTERACTIVE,
+            key=("rag", self.ai_model.model_name, message)
+        )
+        self._track_reply(request_id, window.chat_widget)
+    
+    def _track_reply(self, request_id, chat_widget, chat_message=None):
+        self.pending_replies[request_id] = {
+            'chat_widget': chat_widget,
+            'message': chat_message,  # chat messages are remembered with their answer
+            'sources': None,
+            'parts': [],
+            'done': False,
+            'response': None,
+            'error': None,
+            'cancelled': None
+        }
+        self.reply_order.append(request_id)
     
     def handle_action_message(self, message):
         # Actions are usually quick, keep synchronous
@@ -59,36 +150,163 @@ class AppController:
         window = QApplication.instance().activeWindow()
         window.chat_widget.add_ai_message(response)
     
-    def _on_chat_response_ready(self, response):
+    def _on_first_token(self, request_id, seconds):
+        """Time to first token is the latency the user actually notices"""
+        self.last_first_token_latency = seconds
+        print(f"Time to first token: {seconds * 1000:.0f} ms")
+    
+    def _is_live(self, request_id):
+        return bool(self.reply_order) and self.reply_order[0] == request_id
+    
+    def _on_retrieval_done(self, request_id, sources):
+        reply = self.pending_replies.get(request_id)
+        if reply is None:
+            return
+        if self._is_live(request_id):
+            # Sources are shown as soon as retrieval is done, before the answer arrives
+            reply['chat_widget'].add_sources_message(sources)
+        else:
+            reply['sources'] = sources
+    
+    def _on_token_received(self, request_id, text):
+        reply = self.pending_replies.get(request_id)
+        if reply is None:
+            return
+        if self._is_live(request_id):
+            reply['chat_widget'].append_ai_tokens(text)
+        else:
+            reply['parts'].append(text)
+    
+    def _on_chat_response_ready(self, request_id, response):
         """Called when AI response is ready"""
-        window = QApplication.instance().activeWindow()
-        window.chat_widget.hide_ai_thinking()
-        window.chat_widget.add_ai_message(response)
-        
-        # Clean up worker
-        if self.current_worker:
-            self.current_worker.deleteLater()
-            self.current_worker = None
+        if request_id in self.summary_requests:
+            self.memory.apply_summary(self.summary_requests.pop(request_id), response)
+            self._summarize_memory()  # turns that were moved out meanwhile
+            return
+        reply = self.pending_replies.get(request_id)
+        if reply is None:
+            return
+        reply['done'] = True
+        reply['response'] = response
+        self._show_finished_replies()
     
-    def _on_ai_error(self, error_message):
+    def _on_ai_error(self, request_id, error_message):
         """Called when AI encounters an error"""
-        window = QApplication.instance().activeWindow()
-        window.chat_widget.hide_ai_thinking()
-        window.chat_widget.add_ai_message(f"Error: {error_message}")
-        
-        # Clean up worker
-        if self.current_worker:
-            self.current_worker.deleteLater()
-            self.current_worker = None
+        if request_id in self.summary_requests:
+            self.memory.summary_failed(self.summary_requests.pop(request_id))
+            return
+        reply = self.pending_replies.get(request_id)
+        if reply is None:
+            return
+        reply['done'] = True
+        reply['error'] = error_message
+        self._show_finished_replies()
+    
+    def stop_generation(self):
+        """Cancel every reply that is still open (the chat's stop button)"""
+        for request_id in list(self.reply_order):
+            if not self.pending_replies[request_id]['done']:
+                self.scheduler.cancel(request_id)
+    
+    def _on_request_cancelled(self, request_id, generated, saved):
+        if request_id in self.summary_requests:
+            self.memory.summary_failed(self.summary_requests.pop(request_id))
+            return
+        reply = self.pending_replies.get(request_id)
+        if reply is None:
+            return
+        reply['done'] = True
+        reply['cancelled'] = (generated, saved)
+        if saved:
+            print(f"Generation stopped after {generated} tokens, about {saved} tokens saved")
+        self._show_finished_replies()
+    
+    def _show_finished_replies(self):
+        """Close finished replies in order, then let the next one stream live"""
+        while self.reply_order:
+            request_id = self.reply_order[0]
+            reply = self.pending_replies[request_id]
+            chat_widget = reply['chat_widget']
+            
+            # Catch up on whatever arrived while an earlier reply was on screen
+            if reply['sources'] is not None:
+                chat_widget.add_sources_message(reply['sources'])
+                reply['sources'] = None
+            if reply['parts']:
+                chat_widget.append_ai_tokens("".join(reply['parts']))
+                reply['parts'] = []
+            
+            if not reply['done']:
+                chat_widget.show_ai_thinking()
+                return
+            
+            if reply['cancelled'] is not None:
+                generated, saved = reply['cancelled']
+                chat_widget.finish_ai_stream()
+                if generated or saved:
+                    chat_widget.add_system_message(f"Generation stopped ({generated} tokens generated, ~{saved} saved)")
+                else:
+                    chat_widget.add_system_message("Request cancelled")
+            elif reply['error'] is not None:
+                chat_widget.finish_ai_stream()
+                chat_widget.add_ai_message(f"Error: {reply['error']}")
+            else:
+                # Closes the streamed message (or shows the response if nothing was streamed)
+                chat_widget.finish_ai_stream(reply['response'])
+                if reply['message'] is not None and reply['response']:
+                    self._remember(reply['message'], reply['response'])
+            
+            self.reply_order.pop(0)
+            del self.pending_replies[request_id]
+    
+    def _remember(self, message, response):
+        if self.memory.add_exchange(message, response):
+            self._summarize_memory()
+    
+    def _summarize_memory(self):
+        """Fold turns that left the chat history into the summary, behind any interactive request"""
+        request = self.memory.summary_request()
+        if request is None:
+            return
+        turns, prompt = request
+        request_id = self.scheduler.submit(
+            lambda: AIWorker(self.ai_model, prompt, "summary", stream=False,
+                             temperature=SUMMARY_TEMPERATURE, max_tokens=self.memory.summary_tokens),
+            priority=PRIORITY_BACKGROUND
+        )
+        self.summary_requests[request_id] = turns
     
     def upload_document(self):
         file_path, _ = QFileDialog.getOpenFileName(
-            None, "Upload Document", "", "Text Files (*.txt *.md *.pdf)"
+            None, "Upload Document", "", "Text Files (*.txt *.md)"
         )
         if file_path:
-            self.rag_controller.add_document(file_path)
             window = QApplication.instance().activeWindow()
-            window.chat_widget.add_system_message(f"Document uploaded: {os.path.basename(file_path)}")
+            chat_widget = window.chat_widget
+            filename = os.path.basename(file_path)
+            
+            # Chunking and embedding run on a worker, the UI only gets progress updates
+            worker = self.rag_controller.add_document(file_path)
+            if worker is None:
+                chat_widget.add_system_message(f"Could not open document: {filename}")
+                return
+            
+            chat_widget.add_system_message(f"Document uploaded: {filename} - indexing in the background")
+            worker.progress.connect(chat_widget.show_indexing_progress)
+            worker.document_indexed.connect(
+                lambda name, chunks: self._on_document_indexed(chat_widget, name, chunks)
+            )
+            worker.error_occurred.connect(
+                lambda error: self._on_document_indexed(chat_widget, filename, 0, error)
+            )
+    
+    def _on_document_indexed(self, chat_widget, filename, chunks, error=None):
+        """Called when an upload has been chunked, embedded and indexed"""
+        chat_widget.hide_indexing_progress()
+        if error:
+            chat_widget.add_system_message(error)
+        else:
+            chat_widget.add_system_message(f"Document indexed: {filename} ({chunks} chunks)")
     
     def upload_image(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -0,0 +1,46 @@
+import os
+from PySide6.QtCore import QThread, Signal
+
+class IndexingWorker(QThread):
+    progress = Signal(str, int)  # filename, percent
+    document_indexed = Signal(str, int)  # filename, chunks embedded
+    error_occurred = Signal(str)
+    
+    def __init__(self, rag_engine, file_paths=()):
+        """Loads the RAG engine and indexes files in the background (no files = just load)"""
+        super().__init__()
+        self.rag_engine = rag_engine
+        self.file_paths = list(file_paths)
+    
+    def run(self):
+        try:
+            self.rag_engine.load()
+        except Exception as e:
+            self.error_occurred.emit(f"Could not load the RAG engine: {e}")
+            return
+        
+        for file_path in self.file_paths:
+            filename = os.path.basename(file_path)
+            last_percent = -1
+            
+            def report(bytes_done, bytes_total):
+                nonlocal last_percent
+                # Checked between batches, the saved index stays as it was
+                if self.isInterruptionRequested():
+                    raise InterruptedError("indexing cancelled")
+                percent = int(100 * bytes_done / bytes_total) if bytes_total else 100
+                # Only whole percent steps cross the thread boundary
+                if percent != last_percent:
+                    last_percent = percent
+                    self.progress.emit(filename, percent)
+            
+            if self.isInterruptionRequested():
+                return
+            
+            try:
+                added = self.rag_engine.add_document(file_path, progress_callback=report)
+                self.document_indexed.emit(filename, added)
+            except InterruptedError:
+                return
+            except Exception as e:
+                self.error_occurred.emit(f"Error indexing {filename}: {e}")
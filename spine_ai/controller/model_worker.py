@@ -0,0 +1,75 @@
+import threading
+from PySide6.QtCore import QThread, Signal
+
+def run_interruptible(worker, function, *args):
+    """
+    Run a blocking call on a daemon thread until it returns or the worker is cancelled
+    
+    An HTTP call can't be stopped halfway, so a cancelled call is left to
+    finish (or to end with the process) and the worker returns right away.
+    
+    Returns:
+        The call's result, or None if the worker was cancelled
+    """
+    outcome = {}
+    
+    def call():
+        try:
+            outcome['result'] = function(*args)
+        except Exception as e:
+            outcome['error'] = e
+    
+    thread = threading.Thread(target=call, daemon=True)
+    thread.start()
+    while thread.is_alive():
+        if worker.isInterruptionRequested():
+            return None
+        thread.join(0.1)
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+class ModelWarmupWorker(QThread):
+    warmed_up = Signal(str, float)  # model name, seconds the load took
+    error_occurred = Signal(str, str)  # model name, error
+    
+    def __init__(self, ai_model, model_name):
+        """Loads a model into Ollama in the background so the first message doesn't wait for it"""
+        super().__init__()
+        self.ai_model = ai_model
+        self.model_name = model_name
+    
+    def cancel(self):
+        """Stop waiting for the load (it goes on in Ollama)"""
+        self.requestInterruption()
+    
+    def run(self):
+        try:
+            seconds = run_interruptible(self, self.ai_model.warm_up, self.model_name)
+            if self.isInterruptionRequested():
+                return
+            self.warmed_up.emit(self.model_name, seconds)
+        except Exception as e:
+            self.error_occurred.emit(self.model_name, str(e))
+
+class ModelListWorker(QThread):
+    models_ready = Signal(list)
+    error_occurred = Signal(str)
+    
+    def __init__(self, ai_model):
+        """Asks Ollama for its installed models without blocking window construction"""
+        super().__init__()
+        self.ai_model = ai_model
+    
+    def cancel(self):
+        self.requestInterruption()
+    
+    def run(self):
+        models = run_interruptible(self, self.ai_model.list_models)
+        if self.isInterruptionRequested():
+            return
+        # list_models reports failures as an "Error: ..." string
+        if isinstance(models, list):
+            self.models_ready.emit(models)
+        else:
+            self.error_occurred.emit(str(models))
@@ -1,42 +1,94 @@
 import os
+from adapter.rag_engine import RAGEngine, DEFAULT_INDEX_DIR
+from .indexing_worker import IndexingWorker
 
 class RAGController:
-    def __init__(self):
-        self.current_model = "tinyllama"
-        self.documents = []
+    def __init__(self, ai_model=None):
+        self.current_model = ai_model.model_name if ai_model else "tinyllama"
+        self.engine = RAGEngine(self.current_model, llm=ai_model)
+        self.workers = []  # running indexing workers
     
     def set_model(self, model_name):
         self.current_model = model_name
+        self.engine.set_model(model_name)
     
-    def add_document(self, file_path):
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            self.documents.append({
-                'path': file_path,
-                'name': os.path.basename(file_path),
-                'content': content
-            })
-            return True
-        except Exception as e:
-            print(f"Error adding document: {e}")
-            return False
-    
-    def process_query(self, query):
-        # Placeholder for RAG processing
-        # TODO: Integrate with your FAISS RAG system
+    def load_saved_index(self):
+        """Load a previously saved index in the background, if there is one"""
+        if os.path.exists(os.path.join(DEFAULT_INDEX_DIR, "manifest.json")):
+            return self.start_indexing()
+        return None
+    
+    def start_indexing(self, file_paths=()):
+        """
+        Index files on a background worker (no files = just load the saved index)
         
-        if not self.documents:
+        Returns:
+            The started IndexingWorker, so callers can connect to its signals
+        """
+        worker = IndexingWorker(self.engine, file_paths)
+        worker.finished.connect(lambda: self._on_worker_finished(worker))
+        self.workers.append(worker)
+        worker.start()
+        return worker
+    
+    def _on_worker_finished(self, worker):
+        if worker in self.workers:
+            self.workers.remove(worker)
+        worker.deleteLater()
+    
+    def shutdown(self):
+        """Stop indexing workers before the app exits (Qt aborts on running threads)"""
+        for worker in list(self.workers):
+            worker.requestInterruption()
+            worker.wait()
+    
+    def add_document(self, file_path):
+        if not os.path.isfile(file_path):
+            print(f"Error adding document: {file_path} not found")
+            return None
+        return self.start_indexing([file_path])
+    
+    def retrieve(self, query, top_k=3):
+        """Hybrid search over whatever has been indexed so far (safe to call from a worker)"""
+        return self.engine.search(query, top_k=top_k)
+    
+    def no_results_message(self, query):
+        if self.workers:
+            return "Your documents are still being indexed, please try again in a moment."
+        if not self.engine.has_vectors:
             return "No documents loaded. Please upload some documents first."
+        return f"No relevant information found for '{query}' in uploaded documents."
+    
+    def format_sources(self, results):
+        """Plain data for the UI (results hold numpy values and long texts)"""
+        return [
+            {
+                'filename': result['metadata']['filename'],
+                'snippet': result['chunk'][:200],
+                'score': float(result['score'])
+            }
+            for result in results
+        ]
+    
+    def build_prompt(self, query, results):
+        context_parts = []
+        for result in results:
+            context_parts.append(f"Source: {result['metadata']['filename']}")
+            context_parts.append(f"Content: {result['chunk'][:500]}...")
+            context_parts.append("---")
+        context = "\n".join(context_parts)
         
-        # Simple keyword search for now
-        relevant_docs = []
-        for doc in self.documents:
-            if query.lower() in doc['content'].lower():
-                relevant_docs.append(doc['name'])
-        
-        if relevant_docs:
-            return f"Found information in: {', '.join(relevant_docs)}\n\nRAG Response: This is a placeholder response based on your query '{query}'"
-        else:
-            return f"No relevant information found for '{query}' in uploaded documents."
+        return f"""Based on the following context information, please answer the question.
+
+Context:
+{context}
+
+Question: {query}
+
+Instructions:
+- Use the provided context to answer the question
+- If the context doesn't contain relevant information, say so
+- Be specific and cite which sources support your answer
+- Keep your answer concise but complete
+
+Answer:"""
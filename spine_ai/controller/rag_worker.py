@@ -0,0 +1,62 @@
+import time
+from PySide6.QtCore import QThread, Signal
+
+class RAGWorker(QThread):
+    retrieval_done = Signal(list)  # [{'filename': ..., 'snippet': ..., 'score': ...}], sent before generation
+    response_ready = Signal(str)
+    error_occurred = Signal(str)
+    token_received = Signal(str)  # streamed answer chunks, in order
+    first_token = Signal(float)  # seconds from request to first token
+    cancelled = Signal(int, int)  # tokens generated, tokens saved (estimated against the max_tokens cap)
+    
+    def __init__(self, rag_controller, ai_model, query):
+        super().__init__()
+        self.rag_controller = rag_controller
+        self.ai_model = ai_model
+        self.query = query
+        self.max_tokens = 500
+        self.created_at = time.perf_counter()
+    
+    def cancel(self):
+        """Stop the generation after the next token (safe to call from the UI thread)"""
+        self.requestInterruption()
+    
+    def run(self):
+        try:
+            # Retrieve first, so sources can be shown while the answer is generated
+            results = self.rag_controller.retrieve(self.query)
+            if not results:
+                self.response_ready.emit(self.rag_controller.no_results_message(self.query))
+                return
+            
+            self.retrieval_done.emit(self.rag_controller.format_sources(results))
+            if self.isInterruptionRequested():
+                self.cancelled.emit(0, self.max_tokens)
+                return
+            
+            parts = []
+            stream = self.ai_model.generate_stream(
+                prompt=self.rag_controller.build_prompt(self.query, results),
+                temperature=0.3,  # Lower temperature for factual responses
+                max_tokens=self.max_tokens,
+                stop=['Question:', 'Context:']
+            )
+            try:
+                for text in stream:
+                    if self.isInterruptionRequested():
+                        break
+                    if not parts:
+                        self.first_token.emit(time.perf_counter() - self.created_at)
+                    parts.append(text)
+                    self.token_received.emit(text)
+            finally:
+                # Closes the HTTP stream, so Ollama stops decoding a cancelled answer
+                stream.close()
+            
+            if self.isInterruptionRequested():
+                # Stream chunks are about one token each
+                self.cancelled.emit(len(parts), max(self.max_tokens - len(parts), 0))
+                return
+            self.response_ready.emit("".join(parts).strip())
+        except Exception as e:
+            self.error_occurred.emit(str(e))
@@ -0,0 +1,204 @@
+import time
+import heapq
+import itertools
+from PySide6.QtCore import QObject, Signal, Slot
+
+# Lower number runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+class _Job:
+    def __init__(self, make_worker, priority, key):
+        self.make_worker = make_worker
+        self.priority = priority
+        self.key = key
+        self.request_ids = []  # every request this generation answers
+        self.cancelled_ids = []  # requests cancelled while the worker runs, reported when it stops
+        self.cancelled = False
+        self.worker = None
+
+class RequestScheduler(QObject):
+    """
+    Runs generation workers with a concurrency limit
+    
+    Every submit() gets its own request id, and all worker signals are
+    re-emitted with that id so replies reach the message that asked for
+    them. Waiting requests are started by priority, then in FIFO order.
+    A request with the same key as one that is still waiting is folded
+    into it, so identical prompts only cost one generation.
+    """
+    request_started = Signal(int)
+    retrieval_done = Signal(int, list)
+    token_received = Signal(int, str)
+    first_token = Signal(int, float)  # seconds from submit() to first token
+    response_ready = Signal(int, str)
+    error_occurred = Signal(int, str)
+    request_cancelled = Signal(int, int, int)  # request id, tokens generated, tokens saved
+    
+    def __init__(self, max_concurrent=2):
+        super().__init__()
+        self.max_concurrent = max_concurrent
+        self.queue = []  # (priority, order, job), stale entries are skipped
+        self.waiting = {}  # key -> queued job, for coalescing
+        self.running = {}  # worker -> job
+        self.submitted_at = {}  # request id -> perf_counter at submit
+        self.jobs = {}  # request id -> job, until the request is answered or cancelled
+        self._order = itertools.count()
+        self._request_ids = itertools.count(1)
+    
+    def submit(self, make_worker, priority=PRIORITY_INTERACTIVE, key=None):
+        """
+        Queue a generation
+        
+        Args:
+            make_worker: Function returning an unstarted AIWorker/RAGWorker
+            priority: PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND or any int (lower first)
+            key: Requests with equal keys share one generation while waiting (None = never)
+        
+        Returns:
+            Request id used in all signals for this request
+        """
+        request_id = next(self._request_ids)
+        self.submitted_at[request_id] = time.perf_counter()
+        
+        job = self.waiting.get(key) if key is not None else None
+        if job is None:
+            job = _Job(make_worker, priority, key)
+            if key is not None:
+                self.waiting[key] = job
+            heapq.heappush(self.queue, (priority, next(self._order), job))
+        elif priority < job.priority:
+            # An interactive duplicate lifts a waiting background job
+            job.priority = priority
+            heapq.heappush(self.queue, (priority, next(self._order), job))
+        
+        job.request_ids.append(request_id)
+        self.jobs[request_id] = job
+        self._start_next()
+        return request_id
+    
+    @property
+    def pending_count(self):
+        return sum(1 for priority, _, job in self.queue
+                   if job.worker is None and not job.cancelled and priority == job.priority)
+    
+    def _start_next(self):
+        while self.queue and len(self.running) < self.max_concurrent:
+            priority, _, job = heapq.heappop(self.queue)
+            if job.worker is not None or job.cancelled or priority != job.priority:
+                continue
+            if job.key is not None:
+                self.waiting.pop(job.key, None)
+            
+            worker = job.make_worker()
+            job.worker = worker
+            self.running[worker] = job
+            
+            # Slots on this QObject run on the UI thread, whichever thread emits
+            if hasattr(worker, 'retrieval_done'):
+                worker.retrieval_done.connect(self._on_retrieval_done)
+            worker.token_received.connect(self._on_token_received)
+            worker.first_token.connect(self._on_first_token)
+            worker.response_ready.connect(self._on_response_ready)
+            worker.error_occurred.connect(self._on_error_occurred)
+            worker.cancelled.connect(self._on_cancelled)
+            worker.finished.connect(self._on_worker_finished)
+            
+            for request_id in job.request_ids:
+                self.request_started.emit(request_id)
+            worker.start()
+    
+    def cancel(self, request_id):
+        """
+        Cancel a request
+        
+        A waiting request is dropped right away. A running generation is
+        stopped once every request sharing it has been cancelled, which
+        closes its HTTP stream so Ollama stops decoding.
+        
+        Returns:
+            True if the request was still open
+        """
+        job = self.jobs.pop(request_id, None)
+        if job is None:
+            return False
+        job.request_ids.remove(request_id)
+        self.submitted_at.pop(request_id, None)
+        
+        if job.worker is None:
+            if not job.request_ids:
+                job.cancelled = True
+                if job.key is not None and self.waiting.get(job.key) is job:
+                    del self.waiting[job.key]
+            self.request_cancelled.emit(request_id, 0, 0)
+        elif job.request_ids:
+            # Others still want this answer, this request just stops listening
+            self.request_cancelled.emit(request_id, 0, 0)
+        else:
+            job.cancelled_ids.append(request_id)
+            job.worker.cancel()
+        return True
+    
+    def _job_ids(self):
+        job = self.running.get(self.sender())
+        return job.request_ids if job else []
+    
+    @Slot(list)
+    def _on_retrieval_done(self, sources):
+        for request_id in self._job_ids():
+            self.retrieval_done.emit(request_id, sources)
+    
+    @Slot(str)
+    def _on_token_received(self, text):
+        for request_id in self._job_ids():
+            self.token_received.emit(request_id, text)
+    
+    @Slot(float)
+    def _on_first_token(self, seconds):
+        # The worker measures from its own creation, add the time spent waiting in the queue
+        created_at = self.sender().created_at
+        for request_id in self._job_ids():
+            self.first_token.emit(request_id, seconds + created_at - self.submitted_at[request_id])
+    
+    @Slot(str)
+    def _on_response_ready(self, response):
+        for request_id in self._job_ids():
+            self.submitted_at.pop(request_id, None)
+            self.jobs.pop(request_id, None)
+            self.response_ready.emit(request_id, response)
+    
+    @Slot(str)
+    def _on_error_occurred(self, error_message):
+        for request_id in self._job_ids():
+            self.submitted_at.pop(request_id, None)
+            self.jobs.pop(request_id, None)
+            self.error_occurred.emit(request_id, error_message)
+    
+    @Slot(int, int)
+    def _on_cancelled(self, generated, saved):
+        job = self.running.get(self.sender())
+        if job is None:
+            return
+        for request_id in job.cancelled_ids:
+            self.request_cancelled.emit(request_id, generated, saved)
+        job.cancelled_ids = []
+    
+    @Slot()
+    def _on_worker_finished(self):
+        worker = self.sender()
+        job = self.running.pop(worker, None)
+        # Cancelled too late to stop anything, the worker had already finished
+        if job is not None:
+            for request_id in job.cancelled_ids:
+                self.request_cancelled.emit(request_id, 0, 0)
+        worker.deleteLater()
+        self._start_next()
+    
+    def shutdown(self):
+        """Drop waiting requests, stop running workers and wait for them (Qt aborts on running threads)"""
+        self.queue.clear()
+        self.waiting.clear()
+        for worker in list(self.running):
+            worker.cancel()
+        for worker in list(self.running):
+            worker.wait()
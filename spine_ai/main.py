@@ -1,23 +1,79 @@
 import sys
 import os
-from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import Qt
-from ui.main_window import MainWindow
-from controller.app_controller import AppController
+from utils.startup_profiler import StartupProfiler, profile_path_from_argv
+
+# Phase names for the background start-up workers in --profile-startup reports
+BACKGROUND_PHASES = {
+    'ModelWarmupWorker': 'model load',
+    'ModelListWorker': 'model list',
+    'IndexingWorker': 'index load'
+}
 
 def main():
-    app = QApplication(sys.argv)
-    app.setApplicationName("Spine AI")
-    app.setOrganizationName("AI Tools")
+    # --profile-startup [report.json] times imports, start-up phases and memory, then exits
+    profile_path = profile_path_from_argv(sys.argv)
+    profiler = StartupProfiler()
+    if profile_path:
+        profiler.start_import_tracking()
+    
+    # Imported here rather than at the top so the profiler sees them
+    with profiler.phase("imports"):
+        from PySide6.QtWidgets import QApplication
+        from PySide6.QtCore import Qt, QTimer
+        from ui.main_window import MainWindow
+        from controller.app_controller import AppController
+    
+    with profiler.phase("qt application"):
+        app = QApplication(sys.argv)
+        app.setApplicationName("Spine AI")
+        app.setOrganizationName("AI Tools")
+        
+        # Set application style
+        app.setStyle('Fusion')
     
-    # Set application style
-    app.setStyle('Fusion')
+    with profiler.phase("controller"):
+        controller = AppController()
+        app.aboutToQuit.connect(controller.shutdown)
     
-    controller = AppController()
+    profiler.begin("window show")
     window = MainWindow(controller)
     window.show()
+    app.aboutToQuit.connect(window.chat_widget.chat_model.close)
+    
+    def start_background_tasks():
+        profiler.end("window show")
+        # Ollama, torch and faiss load on workers after the window has painted
+        window.start_background_tasks()
+        if profile_path:
+            _profile_background_tasks(app, controller, profiler, profile_path)
+    
+    QTimer.singleShot(0, start_background_tasks)
     
     sys.exit(app.exec())
 
+def _profile_background_tasks(app, controller, profiler, profile_path):
+    """Time each start-up worker, then write the report and quit once all are done"""
+    from PySide6.QtCore import QTimer
+    
+    names = []
+    for worker in controller.background_workers + controller.rag_controller.workers:
+        name = BACKGROUND_PHASES.get(type(worker).__name__, type(worker).__name__)
+        names.append(name)
+        profiler.begin(name)
+        worker.finished.connect(lambda name=name: profiler.end(name))
+    
+    def check_done():
+        if controller.background_workers or controller.rag_controller.workers:
+            QTimer.singleShot(50, check_done)
+            return
+        # A worker that finished before it was connected ends here (ending twice is harmless)
+        for name in names:
+            profiler.end(name)
+        profiler.stop_import_tracking()
+        profiler.write(profile_path)
+        app.quit()
+    
+    check_done()
+
 if __name__ == "__main__":
     main()
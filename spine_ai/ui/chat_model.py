@@ -0,0 +1,229 @@
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+
+from adapter.chat_history import ChatHistoryStore
+
+class ChatMessageModel(QAbstractListModel):
+    def __init__(self, history=None, max_rows=500, page_size=100):
+        """
+        Chat messages for the chat list view
+        
+        Only a window of at most max_rows messages stays in memory. Every
+        message is also written to the history store, so rows outside the
+        window can be dropped with trim() and paged back in with
+        load_older()/load_newer() as the user scrolls. Only the newest page
+        is read at start-up.
+        
+        Args:
+            history: ChatHistoryStore (None = a temporary one for this session)
+            max_rows: Messages kept in memory while the view follows the bottom
+            page_size: Messages loaded per load_older() call
+        """
+        super().__init__()
+        self.history = history if history is not None else ChatHistoryStore()
+        self.max_rows = max_rows
+        self.page_size = page_size
+        self.highlighted_id = None  # search hit being shown
+        self.open_ids = set()  # streamed messages whose text is only in memory so far
+        # dicts: id, kind, prefix, text, data (+ 'layout' cached by the delegate)
+        self.messages = self.history.load_before(None, page_size)
+        self.has_latest = True  # the newest stored message is in the window
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.messages)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.messages):
+            return None
+        if role == Qt.DisplayRole:
+            return self.messages[index.row()]['text']
+        return None
+    
+    def message(self, index):
+        """
+        The message dict behind an index
+        
+        The delegate uses this instead of data(): a dict passed through
+        QVariant comes back as a copy, and its cached layout would be lost.
+        """
+        return self.messages[index.row()]
+    
+    def add_message(self, kind, text, prefix="", data=None):
+        """
+        Append a message (and store it)
+        
+        While an older part of the history is shown the message is only
+        stored, it appears once the view pages down to it.
+        
+        Returns:
+            The message id, used to stream more text into it
+        """
+        message_id = self.history.add(kind, text, prefix, data)
+        if not self.has_latest:
+            return message_id
+        row = len(self.messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.messages.append({'id': message_id, 'kind': kind, 'prefix': prefix, 'text': text, 'data': data})
+        self.endInsertRows()
+        return message_id
+    
+    def append_text(self, message_id, text):
+        """Add streamed text to a message"""
+        row = self._row_of(message_id)
+        if row is None:
+            self.history.append_text(message_id, text)
+            return
+        self.open_ids.add(message_id)
+        message = self.messages[row]
+        message['text'] += text
+        message.pop('layout', None)  # height has to be measured again
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+    
+    def finish_message(self, message_id):
+        """Write the final text of a streamed message to the history store"""
+        self.open_ids.discard(message_id)
+        row = self._row_of(message_id)
+        if row is not None:
+            self.history.update_text(message_id, self.messages[row]['text'])
+    
+    def _row_of(self, message_id):
+        # Streamed messages are near the end, search from there
+        for row in range(len(self.messages) - 1, -1, -1):
+            if self.messages[row]['id'] == message_id:
+                return row
+        return None
+    
+    def trim(self, keep_ids=(), from_end=False):
+        """
+        Drop rows beyond max_rows from memory (they stay in the history store)
+        
+        Args:
+            keep_ids: Messages that must stay loaded (e.g. one that is still streaming)
+            from_end: Drop the newest rows instead of the oldest (the user is reading further up)
+        
+        Returns:
+            Number of rows dropped
+        """
+        excess = len(self.messages) - self.max_rows
+        if excess <= 0:
+            return 0
+        keep_ids = set(keep_ids) | self.open_ids
+        if from_end:
+            first = len(self.messages) - excess
+            if any(message['id'] in keep_ids for message in self.messages[first:]):
+                return 0
+            self.beginRemoveRows(QModelIndex(), first, len(self.messages) - 1)
+            del self.messages[first:]
+            self.endRemoveRows()
+            self.has_latest = False
+            return excess
+        
+        # Never drop a row that is still changing, or anything after it
+        for row in range(excess):
+            if self.messages[row]['id'] in keep_ids:
+                excess = row
+                break
+        if excess <= 0:
+            return 0
+        
+        self.beginRemoveRows(QModelIndex(), 0, excess - 1)
+        del self.messages[:excess]
+        self.endRemoveRows()
+        return excess
+    
+    def can_load_older(self):
+        if not self.messages:
+            return False
+        return self.history.has_before(self.messages[0]['id'])
+    
+    def load_older(self):
+        """
+        Page the previous page_size messages back in at the top
+        
+        Returns:
+            Number of rows inserted
+        """
+        older = self.history.load_before(self.messages[0]['id'] if self.messages else None, self.page_size)
+        if not older:
+            return 0
+        self.beginInsertRows(QModelIndex(), 0, len(older) - 1)
+        self.messages[:0] = older
+        self.endInsertRows()
+        return len(older)
+    
+    def can_load_newer(self):
+        return not self.has_latest
+    
+    def load_newer(self):
+        """
+        Page the next page_size messages back in at the bottom
+        
+        Returns:
+            Number of rows inserted
+        """
+        if self.has_latest or not self.messages:
+            return 0
+        newer = self.history.load_after(self.messages[-1]['id'], self.page_size)
+        if newer:
+            row = len(self.messages)
+            self.beginInsertRows(QModelIndex(), row, row + len(newer) - 1)
+            self.messages.extend(newer)
+            self.endInsertRows()
+        self.has_latest = not self.history.has_after(self.messages[-1]['id'])
+        return len(newer)
+    
+    def show_latest(self):
+        """Replace the window with the newest page (e.g. when the user sends a message)"""
+        if self.has_latest:
+            return
+        self._store_open_messages()
+        self.beginResetModel()
+        self.messages = self.history.load_before(None, self.page_size)
+        self.has_latest = True
+        self.endResetModel()
+    
+    def locate(self, message_id):
+        """
+        Row of a message, paging the history around it in if it is not loaded
+        
+        Returns:
+            The row, or None if the message does not exist
+        """
+        row = self._row_of(message_id)
+        if row is not None:
+            return row
+        
+        # Half a page on each side of the message
+        self._store_open_messages()
+        half = self.page_size // 2
+        window = self.history.load_before(message_id + 1, half + 1)
+        if not window or window[-1]['id'] != message_id:
+            return None
+        window += self.history.load_after(message_id, half)
+        
+        self.beginResetModel()
+        self.messages = window
+        self.has_latest = not self.history.has_after(window[-1]['id'])
+        self.endResetModel()
+        return self._row_of(message_id)
+    
+    def _store_open_messages(self):
+        # Before the window is replaced, or streamed text would be lost
+        for message in self.messages:
+            if message['id'] in self.open_ids:
+                self.history.update_text(message['id'], message['text'])
+    
+    def highlight(self, message_id):
+        """Mark a message (a search hit) for the delegate, None clears it"""
+        rows = {self._row_of(self.highlighted_id), self._row_of(message_id)} - {None}
+        self.highlighted_id = message_id
+        for row in rows:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+    
+    def search(self, query, limit=20):
+        """Ranked search over the whole stored history (see ChatHistoryStore.search)"""
+        return self.history.search(query, limit)
+    
+    def close(self):
+        self.history.close()
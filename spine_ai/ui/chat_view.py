@@ -0,0 +1,184 @@
+import html
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QAbstractItemView
+from PySide6.QtCore import Qt, QSize, QRectF, Signal, QTimer
+from PySide6.QtGui import QTextDocument, QColor, QPainter, QPen
+
+MARGIN = 10  # space around a message
+PADDING = 10  # space inside an AI message bubble
+HIGHLIGHT_COLOR = "#0078d4"
+
+class ChatMessageDelegate(QStyledItemDelegate):
+    def __init__(self, view):
+        """
+        Paints one chat message
+        
+        Rows are laid out with a QTextDocument, and the measured height is
+        cached on the message for the current width, so re-layouts only
+        measure rows that are new, changed, or seen at a new width.
+        """
+        super().__init__(view)
+        self.view = view
+    
+    def _html(self, message):
+        text = html.escape(message['text']).replace("\n", "<br>")
+        kind = message['kind']
+        if kind == "user":
+            return f"<b>You:</b> {text}"
+        if kind == "ai":
+            return f"<b>{html.escape(message['prefix'])}:</b> {text}"
+        if kind == "sources":
+            items = "".join(
+                f"<li><b>{html.escape(source['filename'])}</b>: {html.escape(source['snippet'])}...</li>"
+                for source in message['data'] or []
+            )
+            return f"<span style='color: #888;'>📎 Sources:</span><ul style='color: #888;'>{items}</ul>"
+        return f"<i style='color: #888;'>System: {text}</i>"
+    
+    def _document(self, message, width, color):
+        document = QTextDocument()
+        document.setDocumentMargin(0)
+        document.setDefaultStyleSheet(f"body {{ color: {color}; }}")
+        document.setHtml(f"<body>{self._html(message)}</body>")
+        document.setTextWidth(max(width, 50))
+        return document
+    
+    def _text_width(self, message):
+        inset = MARGIN * 2 + (PADDING * 2 if message['kind'] == "ai" else 0)
+        return self.view.viewport().width() - inset
+    
+    def sizeHint(self, option, index):
+        message = index.model().message(index)
+        width = self._text_width(message)
+        
+        cached = message.get('layout')
+        if cached is not None and cached[0] == width:
+            return QSize(width, cached[1])
+        
+        height = self._document(message, width, "#000000").size().height()
+        height = int(height) + MARGIN + (PADDING * 2 if message['kind'] == "ai" else 0)
+        message['layout'] = (width, height)
+        return QSize(width, height)
+    
+    def paint(self, painter, option, index):
+        message = index.model().message(index)
+        width = self._text_width(message)
+        rect = option.rect.adjusted(MARGIN, MARGIN // 2, -MARGIN, -MARGIN // 2)
+        
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        color = option.palette.text().color().name()
+        if message['kind'] == "ai":
+            # Same look as the old HTML bubble
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor("#f0f0f0"))
+            painter.drawRoundedRect(QRectF(rect), 5, 5)
+            rect = rect.adjusted(PADDING, PADDING, -PADDING, -PADDING)
+            color = "#000000"
+        if message['id'] == index.model().highlighted_id:
+            # Search hit the user jumped to
+            painter.setPen(QPen(QColor(HIGHLIGHT_COLOR), 2))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRoundedRect(QRectF(option.rect.adjusted(MARGIN // 2, 1, -MARGIN // 2, -1)), 5, 5)
+        
+        document = self._document(message, width, color)
+        painter.translate(rect.topLeft())
+        document.drawContents(painter, QRectF(0, 0, rect.width(), rect.height()))
+        painter.restore()
+
+class ChatListView(QListView):
+    older_loaded = Signal(int)  # rows paged back in at the top
+    newer_loaded = Signal(int)  # rows paged back in at the bottom
+    
+    def __init__(self):
+        """
+        Chat list that only paints visible rows
+        
+        Scrolling to either end pages more messages in from the history
+        store, and the far end is dropped again to keep memory bounded.
+        New messages keep the view pinned to the bottom unless the user has
+        scrolled up to read.
+        """
+        super().__init__()
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setFocusPolicy(Qt.NoFocus)
+        self.setUniformItemSizes(False)
+        self.setResizeMode(QListView.Adjust)
+        self.setItemDelegate(ChatMessageDelegate(self))
+        self.paging = False  # loading rows moves the scroll bar, which must not page again
+        self.shown = False
+        self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.shown:
+            # Start at the newest message of a stored conversation
+            self.shown = True
+            QTimer.singleShot(0, self.scroll_to_bottom)
+    
+    def is_at_bottom(self):
+        model = self.model()
+        if model is not None and not model.has_latest:
+            return False  # an older part of the history is shown
+        scroll_bar = self.verticalScrollBar()
+        return scroll_bar.value() >= scroll_bar.maximum() - 4
+    
+    def scroll_to_bottom(self):
+        # Pending layout changes (e.g. a growing streamed message) must be applied first
+        self.executeDelayedItemsLayout()
+        self.scrollToBottom()
+    
+    def dataChanged(self, top_left, bottom_right, roles=()):
+        super().dataChanged(top_left, bottom_right, roles)
+        # QListView only repaints changed rows, their height may have changed too
+        self.scheduleDelayedItemsLayout()
+    
+    def jump_to(self, message_id):
+        """
+        Scroll to a message and highlight it, paging it in from the history if needed
+        
+        Returns:
+            False if the message does not exist
+        """
+        model = self.model()
+        self.paging = True
+        try:
+            row = model.locate(message_id)
+            if row is None:
+                return False
+            model.highlight(message_id)
+            self.executeDelayedItemsLayout()
+            self.scrollTo(model.index(row), QAbstractItemView.PositionAtCenter)
+        finally:
+            self.paging = False
+        return True
+    
+    def _on_scrolled(self, value):
+        model = self.model()
+        if self.paging or model is None:
+            return
+        scroll_bar = self.verticalScrollBar()
+        
+        self.paging = True
+        try:
+            if value == scroll_bar.minimum() and model.can_load_older():
+                added = model.load_older()
+                if added:
+                    # Keep the message that was at the top in place
+                    self.executeDelayedItemsLayout()
+                    self.scrollTo(model.index(added), QAbstractItemView.PositionAtTop)
+                    model.trim(from_end=True)
+                    self.older_loaded.emit(added)
+            elif value == scroll_bar.maximum() and model.can_load_newer():
+                top = self.indexAt(self.viewport().rect().topLeft())
+                anchor_id = model.message(top)['id'] if top.isValid() else None
+                added = model.load_newer()
+                if added and model.trim() and anchor_id is not None:
+                    # Rows above were dropped, keep the message that was at the top in place
+                    self.executeDelayedItemsLayout()
+                    self.scrollTo(model.index(model.locate(anchor_id)), QAbstractItemView.PositionAtTop)
+                if added:
+                    self.newer_loaded.emit(added)
+        finally:
+            self.paging = False
@@ -3,25 +3,38 @@ from PySide6.QtWidgets import (
     QPushButton, QScrollArea, QProgressBar, QLabel
 )
 from PySide6.QtCore import Signal, Qt, QTimer
-from PySide6.QtGui import QTextCursor, QFont
+from PySide6.QtGui import QFont
+
+from adapter.chat_history import ChatHistoryStore, DEFAULT_HISTORY_PATH
+from .chat_model import ChatMessageModel
+from .chat_view import ChatListView
 
 class ChatWidget(QWidget):
     message_sent = Signal(str)
+    stop_requested = Signal()
     
     def __init__(self):
         super().__init__()
         self.current_mode = "chat"
         self.thinking_timer = QTimer()
         self.thinking_dots = 0
+        
+        # Streamed tokens are buffered and painted at ~30 Hz instead of once per token
+        self.stream_buffer = []
+        self.stream_id = None  # message the tokens go into
+        self.stream_timer = QTimer()
+        self.stream_timer.setInterval(33)
+        self.stream_timer.timeout.connect(self._flush_stream)
         self._setup_ui()
     
     def _setup_ui(self):
         layout = QVBoxLayout(self)
         
-        # Chat display area
-        self.chat_display = QTextEdit()
-        self.chat_display.setReadOnly(True)
-        self.chat_display.setMinimumHeight(400)
+        # Chat display area (only visible rows are laid out, the rest stays on disk between sessions)
+        self.chat_model = ChatMessageModel(ChatHistoryStore(DEFAULT_HISTORY_PATH))
+        self.chat_view = ChatListView()
+        self.chat_view.setModel(self.chat_model)
+        self.chat_view.setMinimumHeight(400)
         
         # Progress indicator (hidden by default)
         self.progress_widget = QWidget()
@@ -34,9 +47,20 @@ class ChatWidget(QWidget):
         self.thinking_label = QLabel("🤖 AI is thinking...")
         self.thinking_label.hide()
         
+        # Background document indexing progress (hidden by default)
+        self.indexing_label = QLabel()
+        self.indexing_label.hide()
+        
+        self.indexing_bar = QProgressBar()
+        self.indexing_bar.setRange(0, 100)
+        self.indexing_bar.setMaximumWidth(200)
+        self.indexing_bar.hide()
+        
         progress_layout.addWidget(self.thinking_label)
         progress_layout.addWidget(self.progress_bar)
         progress_layout.addStretch()
+        progress_layout.addWidget(self.indexing_label)
+        progress_layout.addWidget(self.indexing_bar)
         
         # Input area
         input_widget = QWidget()
@@ -53,14 +77,21 @@ class ChatWidget(QWidget):
         self.send_button.setMaximumWidth(100)
         self.send_button.clicked.connect(self._send_message)
         
+        # Stop button (shown while the AI is answering)
+        self.stop_button = QPushButton("Stop ⏹")
+        self.stop_button.setMaximumWidth(100)
+        self.stop_button.clicked.connect(self.stop_requested.emit)
+        self.stop_button.hide()
+        
         send_layout.addStretch()
+        send_layout.addWidget(self.stop_button)
         send_layout.addWidget(self.send_button)
         
         input_layout.addWidget(self.message_input)
         input_layout.addLayout(send_layout)
         
         # Add all widgets to main layout
-        layout.addWidget(self.chat_display, 3)
+        layout.addWidget(self.chat_view, 3)
         layout.addWidget(self.progress_widget)
         layout.addWidget(input_widget, 1)
         
@@ -95,8 +126,9 @@ class ChatWidget(QWidget):
         self.thinking_dots = 0
         self.thinking_timer.start(500)  # Update every 500ms
         
-        # Keep send button disabled
+        # Keep send button disabled, the answer can be stopped instead
         self.send_button.setEnabled(False)
+        self.stop_button.show()
     
     def hide_ai_thinking(self):
         """Hide progress indicator and re-enable input"""
@@ -106,6 +138,18 @@ class ChatWidget(QWidget):
         
         # Re-enable send button
         self.send_button.setEnabled(True)
+        self.stop_button.hide()
+    
+    def show_indexing_progress(self, filename, percent):
+        """Show how far a background document upload has been indexed"""
+        self.indexing_label.setText(f"📥 Indexing {filename}...")
+        self.indexing_bar.setValue(percent)
+        self.indexing_label.show()
+        self.indexing_bar.show()
+    
+    def hide_indexing_progress(self):
+        self.indexing_label.hide()
+        self.indexing_bar.hide()
     
     def _animate_thinking(self):
         """Animate the thinking indicator"""
@@ -113,39 +157,98 @@ class ChatWidget(QWidget):
         self.thinking_label.setText(f"🤖 AI is thinking{dots}")
         self.thinking_dots += 1
     
+    def _add_message(self, kind, text, prefix="", data=None, follow=False):
+        """Append a message, following it if the view was at the bottom (or follow is set)"""
+        if follow:
+            self.chat_model.show_latest()
+        at_bottom = follow or self.chat_view.is_at_bottom()
+        message_id = self.chat_model.add_message(kind, text, prefix, data)
+        if at_bottom:
+            # Old rows only leave memory while nobody is reading them
+            self.chat_model.trim(keep_ids={self.stream_id})
+            self._scroll_to_bottom()
+        return message_id
+    
     def add_user_message(self, message):
-        self.chat_display.append(f"<div style='margin: 10px 0;'><b>You:</b> {message}</div>")
-        self._scroll_to_bottom()
+        self._add_message("user", message, follow=True)
     
-    def add_ai_message(self, message):
+    def _message_prefix(self):
         mode_prefix = {
             "chat": "🤖 AI",
             "rag": "📚 RAG",
             "actions": "⚡ Actions"
         }
-        prefix = mode_prefix.get(self.current_mode, "🤖 AI")
+        return mode_prefix.get(self.current_mode, "🤖 AI")
+    
+    def add_ai_message(self, message):
+        self._add_message("ai", message, self._message_prefix())
+    
+    def append_ai_tokens(self, text):
+        """Add streamed text to the current AI message, opening it on the first token"""
+        if self.stream_id is None:
+            # First token: the thinking indicator gives way to the message itself
+            self.thinking_label.hide()
+            self.progress_bar.hide()
+            self.thinking_timer.stop()
+            
+            self.stream_id = self._add_message("ai", "", self._message_prefix())
+            self.stream_timer.start()
         
-        self.chat_display.append(f"<div style='margin: 10px 0; background-color: #f0f0f0; padding: 10px; border-radius: 5px;'><b>{prefix}:</b> {message}</div>")
-        self._scroll_to_bottom()
+        self.stream_buffer.append(text)
+    
+    def _flush_stream(self):
+        """Paint all buffered tokens with a single edit"""
+        if not self.stream_buffer:
+            return
+        
+        at_bottom = self.chat_view.is_at_bottom()
+        self.chat_model.append_text(self.stream_id, "".join(self.stream_buffer))
+        self.stream_buffer.clear()
+        if at_bottom:
+            self._scroll_to_bottom()
+    
+    def finish_ai_stream(self, response=None):
+        """
+        Close the streamed message and re-enable input
+        
+        Args:
+            response: Full response, shown as a normal message if nothing was streamed
+        """
+        if self.stream_id is not None:
+            self._flush_stream()
+            self.stream_timer.stop()
+            self.chat_model.finish_message(self.stream_id)
+            self.stream_id = None
+        elif response:
+            self.add_ai_message(response)
+        
+        self.hide_ai_thinking()
+    
+    def add_sources_message(self, sources):
+        """Show retrieved sources (list of {'filename', 'snippet', 'score'}) ahead of the answer"""
+        self._add_message("sources", "", data=sources)
     
     def add_system_message(self, message):
-        self.chat_display.append(f"<div style='margin: 5px 0; color: #666; font-style: italic;'>System: {message}</div>")
-        self._scroll_to_bottom()
+        self._add_message("system", message)
     
     def set_mode(self, mode):
         self.current_mode = mode
         mode_names = {"chat": "Normal Chat", "rag": "RAG Search", "actions": "Actions"}
         self.add_system_message(f"Switched to {mode_names.get(mode, mode)} mode")
     
-    def search_messages(self, query):
-        # Simple search implementation
-        content = self.chat_display.toPlainText()
-        if query.lower() in content.lower():
-            self.add_system_message(f"Found '{query}' in chat history")
-        else:
-            self.add_system_message(f"'{query}' not found in chat history")
+    def search_messages(self, query, limit=20):
+        """
+        Search the whole stored history, including earlier sessions
+        
+        Returns:
+            Hits as {'id', 'kind', 'snippet', 'score'}, best match first
+        """
+        return self.chat_model.search(query, limit)
+    
+    def jump_to_message(self, message_id):
+        """Scroll to a message (e.g. a search hit), loading it from the history if needed"""
+        if not self.chat_view.jump_to(message_id):
+            self.add_system_message("That message is no longer in the chat history")
     
     def _scroll_to_bottom(self):
-        cursor = self.chat_display.textCursor()
-        cursor.movePosition(QTextCursor.End)
-        self.chat_display.setTextCursor(cursor)
+        self.chat_view.scroll_to_bottom()
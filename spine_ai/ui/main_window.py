@@ -1,14 +1,16 @@
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QHBoxLayout, QVBoxLayout, 
-    QSplitter, QPushButton, QLineEdit, QComboBox, QLabel
+    QSplitter, QPushButton, QLineEdit, QComboBox, QLabel,
+    QListWidget, QListWidgetItem
 )
-from PySide6.QtCore import Qt, Signal
+from PySide6.QtCore import Qt, Signal, QTimer
 from PySide6.QtGui import QIcon
 
 from .sidebar_widget import SidebarWidget
 from .chat_widget import ChatWidget
 from .theme_manager import ThemeManager
-from adapter.ai_model import AIModel
+
+SEARCH_ICONS = {'user': "👤", 'ai': "🤖", 'system': "ℹ️"}
 
 class MainWindow(QMainWindow):
     model_changed = Signal(str)
@@ -18,7 +20,6 @@ class MainWindow(QMainWindow):
         self.controller = controller
         self.theme_manager = ThemeManager()
         self.current_mode = "chat"  # chat, rag, actions
-        self.ai_model = AIModel()
         
         self.setWindowTitle("Spine AI")
         self.setMinimumSize(1200, 800)
@@ -28,6 +29,13 @@ class MainWindow(QMainWindow):
         self._connect_signals()
         self._apply_theme()
     
+    def start_background_tasks(self):
+        """Start the model list, model warm-up and index load (called once the window is shown)"""
+        models_worker = self.controller.fetch_models()
+        models_worker.models_ready.connect(self._on_models_listed)
+        self._watch_warm_up(self.controller.warm_up_model())
+        self.controller.start_background_tasks()
+    
     def _setup_ui(self):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -55,6 +63,12 @@ class MainWindow(QMainWindow):
         self.chat_widget = ChatWidget()
         right_layout.addWidget(self.chat_widget)
         
+        # Search hits, shown while something is typed in the search bar
+        self.search_results = QListWidget()
+        self.search_results.setMaximumHeight(160)
+        self.search_results.hide()
+        right_layout.addWidget(self.search_results)
+        
         # Bottom search bar
         bottom_bar = self._create_bottom_bar()
         right_layout.addWidget(bottom_bar)
@@ -72,10 +86,12 @@ class MainWindow(QMainWindow):
         # Model selector
         model_label = QLabel("Model:")
         self.model_combo = QComboBox()
-        model_list = self.ai_model.list_models() 
-        self.model_combo.addItems(["tinyllama", "gemma3:4b"])
+        self.model_combo.addItems(["tinyllama", "gemma3:4b"])  # installed models are added when listed
         self.model_combo.setMinimumWidth(150)
         
+        # Model load state
+        self.model_status = QLabel()
+        
         # Theme toggle
         self.theme_toggle = QPushButton("🌙")
         self.theme_toggle.setMaximumWidth(40)
@@ -100,6 +116,7 @@ class MainWindow(QMainWindow):
         
         top_layout.addWidget(model_label)
         top_layout.addWidget(self.model_combo)
+        top_layout.addWidget(self.model_status)
         top_layout.addStretch()
         top_layout.addLayout(upload_layout)
         top_layout.addWidget(self.theme_toggle)
@@ -118,6 +135,14 @@ class MainWindow(QMainWindow):
         search_btn = QPushButton("🔍")
         search_btn.setMaximumWidth(40)
         search_btn.clicked.connect(self._search_chat)
+        self.search_input.returnPressed.connect(self._search_chat)
+        
+        # Search as the user types, once typing pauses
+        self.search_timer = QTimer()
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self._show_search_results)
+        self.search_input.textChanged.connect(self.search_timer.start)
         
         bottom_layout.addWidget(self.search_input)
         bottom_layout.addWidget(search_btn)
@@ -131,8 +156,12 @@ class MainWindow(QMainWindow):
         # Model change signal
         self.model_combo.currentTextChanged.connect(self._on_model_changed)
         
+        # Search hits
+        self.search_results.itemClicked.connect(self._on_search_result_clicked)
+        
         # Chat widget signals
         self.chat_widget.message_sent.connect(self._on_message_sent)
+        self.chat_widget.stop_requested.connect(self.controller.stop_generation)
     
     def _toggle_theme(self):
         if self.theme_manager.is_dark_theme:
@@ -152,9 +181,40 @@ class MainWindow(QMainWindow):
         print(f"Mode changed to: {mode}")
     
     def _on_model_changed(self, model):
-        self.controller.change_model(model)
+        self._watch_warm_up(self.controller.change_model(model))
         self.chat_widget.add_system_message(f"Model changed to: {model}")
     
+    def _on_models_listed(self, models):
+        """Add installed models to the selector, keeping the current choice"""
+        known = {self.model_combo.itemText(i) for i in range(self.model_combo.count())}
+        new_models = []
+        for name in models:
+            # "tinyllama:latest" is the same model as "tinyllama"
+            short_name = name[:-len(":latest")] if name.endswith(":latest") else name
+            if short_name not in known:
+                known.add(short_name)
+                new_models.append(short_name)
+        
+        self.model_combo.blockSignals(True)
+        self.model_combo.addItems(new_models)
+        self.model_combo.blockSignals(False)
+    
+    def _watch_warm_up(self, worker):
+        self.model_status.setText(f"⏳ Loading {worker.model_name}...")
+        worker.warmed_up.connect(self._on_model_warmed_up)
+        worker.error_occurred.connect(self._on_model_warm_up_failed)
+    
+    def _on_model_warmed_up(self, model, seconds):
+        # A slower load of a previously selected model must not overwrite the status
+        if model == self.model_combo.currentText():
+            self.model_status.setText(f"✅ Ready ({seconds:.1f}s)")
+            self.model_status.setToolTip("")
+    
+    def _on_model_warm_up_failed(self, model, error):
+        if model == self.model_combo.currentText():
+            self.model_status.setText("⚠️ Model not loaded")
+            self.model_status.setToolTip(error)
+    
     def _on_message_sent(self, message):
         if self.current_mode == "chat":
             self.controller.handle_chat_message(message)
@@ -172,7 +232,34 @@ class MainWindow(QMainWindow):
     def _upload_file(self):
         self.controller.upload_file()
     
+    def _show_search_results(self):
+        """Fill the hit list for the current search text, returns the hits"""
+        query = self.search_input.text().strip()
+        hits = self.chat_widget.search_messages(query) if query else []
+        
+        self.search_results.clear()
+        for hit in hits:
+            item = QListWidgetItem(f"{SEARCH_ICONS.get(hit['kind'], '💬')} {hit['snippet']}")
+            item.setData(Qt.UserRole, hit['id'])
+            self.search_results.addItem(item)
+        if query and not hits:
+            item = QListWidgetItem(f"'{query}' not found in chat history")
+            item.setFlags(Qt.NoItemFlags)
+            self.search_results.addItem(item)
+        self.search_results.setVisible(bool(query))
+        return hits
+    
+    def _on_search_result_clicked(self, item):
+        message_id = item.data(Qt.UserRole)
+        if message_id is not None:
+            self.chat_widget.jump_to_message(message_id)
+    
     def _search_chat(self):
+        """Enter or 🔍: jump straight to the best hit"""
+        self.search_timer.stop()
         query = self.search_input.text().strip()
-        if query:
-            self.chat_widget.search_messages(query)
+        if not query:
+            return
+        hits = self._show_search_results()
+        if hits:
+            self.chat_widget.jump_to_message(hits[0]['id'])
@@ -29,7 +29,7 @@ class ThemeManager(QObject):
         QPushButton:checked {
             background-color: #0078d4;
         }
-        QTextEdit {
+        QTextEdit, QListView {
             background-color: #1e1e1e;
             border: 1px solid #555555;
             color: #ffffff;
@@ -77,7 +77,7 @@ class ThemeManager(QObject):
             background-color: #0078d4;
             color: #ffffff;
         }
-        QTextEdit {
+        QTextEdit, QListView {
             background-color: #ffffff;
             border: 1px solid #cccccc;
             color: #000000;
@@ -0,0 +1,281 @@
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import importlib.abc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Bump when the report layout changes, so tracking scripts can tell versions apart
+REPORT_VERSION = 2
+
+PROFILE_FLAG = "--profile-startup"
+
+
+def profile_path_from_argv(argv, default="startup_profile.json"):
+    """
+    Find --profile-startup in the command line
+
+    Returns:
+        Report path (the argument after the flag, or default), or None if the flag is absent
+    """
+    if PROFILE_FLAG not in argv:
+        return None
+    position = argv.index(PROFILE_FLAG)
+    if position + 1 < len(argv) and not argv[position + 1].startswith("-"):
+        return argv[position + 1]
+    return default
+
+
+def _rss_mb():
+    """Current resident set size (Linux only, None elsewhere)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_mb():
+    """Highest resident set size of the process so far (ru_maxrss is KB on Linux, bytes on macOS)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class StartupProfiler:
+    def __init__(self):
+        """
+        Records where launch time goes and writes it as a JSON report
+
+        Per-module import times come from a finder at the front of
+        sys.meta_path that times each module's loader, so imports through
+        importlib.import_module and other deferred imports are counted too
+        (cumulative = with everything the module imported, self = without).
+        Built-in and frozen modules are not timed.
+
+        Phases are timed with phase() or begin()/end() and record the
+        resident memory at both ends (rss_delta_mb is what the process
+        grew or shrank by while the phase ran, including other threads).
+        The process's lifetime peak is reported once, as
+        process_peak_rss_mb. Repeated work such as embedding batches can
+        be summed into one phase with instrument().
+        """
+        self.started_at = datetime.now().isoformat()
+        self.origin = time.perf_counter()
+        self.phases = []  # finished phases, in end order
+        self.open_phases = {}  # name -> (start time, rss at start), for begin()/end()
+        self.totals = {}  # name -> {'duration', 'calls'}, filled by instrument()
+        self.imports = []  # (module, self seconds, cumulative seconds)
+        self._finder = None
+        self._import_state = threading.local()
+
+    def _now(self):
+        return time.perf_counter() - self.origin
+
+    def start_import_tracking(self):
+        """Time every module imported from now on (install before the heavy imports)"""
+        if self._finder is not None:
+            return
+        self._finder = _ImportTimer(self)
+        sys.meta_path.insert(0, self._finder)
+
+    def stop_import_tracking(self):
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+
+    def _timed_load(self, module_name, function, *args):
+        """Run one loader step of a module, adding its time to the module's import record"""
+        stack = getattr(self._import_state, 'stack', None)
+        if stack is None:
+            stack = self._import_state.stack = []
+        stack.append(0.0)  # time spent in nested imports
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            seconds = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += seconds
+            timing = self._import_state.pending.setdefault(module_name, [0.0, 0.0])
+            timing[0] += seconds - nested
+            timing[1] += seconds
+
+    def begin(self, name):
+        self.open_phases[name] = (self._now(), _rss_mb())
+
+    def end(self, name):
+        start, start_rss = self.open_phases.pop(name, (None, None))
+        if start is None:
+            return
+        end = self._now()
+        rss = _rss_mb()
+        self.phases.append({
+            'name': name,
+            'start_s': round(start, 4),
+            'duration_s': round(end - start, 4),
+            'rss_start_mb': start_rss,
+            'rss_mb': rss,
+            'rss_delta_mb': round(rss - start_rss, 2) if rss is not None and start_rss is not None else None
+        })
+
+    def phase(self, name):
+        """Context manager timing one phase"""
+        return _Phase(self, name)
+
+    def instrument(self, obj, attribute, name):
+        """
+        Add the time spent in obj.attribute to a summed phase
+
+        Only this object is patched, its class is left alone.
+        """
+        method = getattr(obj, attribute)
+        totals = self.totals.setdefault(name, {'duration': 0.0, 'calls': 0})
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                totals['duration'] += time.perf_counter() - start
+                totals['calls'] += 1
+        setattr(obj, attribute, timed)
+
+    def summed(self, name):
+        """Seconds summed so far for an instrumented phase"""
+        return self.totals.get(name, {'duration': 0.0})['duration']
+
+    def add_time(self, name, seconds, calls=1):
+        """Add measured time to a summed phase"""
+        totals = self.totals.setdefault(name, {'duration': 0.0, 'calls': 0})
+        totals['duration'] += seconds
+        totals['calls'] += calls
+
+    def report(self, top_imports=50):
+        imports = sorted(self.imports, key=lambda item: item[2], reverse=True)
+
+        # Self time per top-level package adds up without double counting
+        packages = {}
+        for module_name, self_time, _ in self.imports:
+            package = module_name.split('.')[0]
+            packages[package] = packages.get(package, 0.0) + self_time
+
+        return {
+            'version': REPORT_VERSION,
+            'started_at': self.started_at,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'argv': sys.argv,
+            'total_s': round(self._now(), 4),
+            'process_peak_rss_mb': _peak_rss_mb(),
+            'phases': self.phases,
+            'summed_phases': [
+                {'name': name, 'duration_s': round(total['duration'], 4), 'calls': total['calls']}
+                for name, total in self.totals.items()
+            ],
+            'imports': {
+                'count': len(self.imports),
+                'total_s': round(sum(self_time for _, self_time, _ in self.imports), 4),
+                'packages': [
+                    {'package': package, 'self_s': round(seconds, 4)}
+                    for package, seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)
+                ],
+                'slowest': [
+                    {'module': module_name, 'self_s': round(self_time, 4), 'cumulative_s': round(cumulative, 4)}
+                    for module_name, self_time, cumulative in imports[:top_imports]
+                ]
+            }
+        }
+
+    def write(self, path):
+        """Write the JSON report and print a short summary"""
+        report = self.report()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+        print(f"⏱️ Startup profile written to: {path}")
+        for phase in report['phases']:
+            print(f"   {phase['name']}: {phase['duration_s'] * 1000:.0f} ms")
+        for phase in report['summed_phases']:
+            print(f"   {phase['name']}: {phase['duration_s'] * 1000:.0f} ms in {phase['calls']} calls")
+        return report
+
+
+class _Phase:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.begin(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.profiler.end(self.name)
+        return False
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    def __init__(self, profiler):
+        """Finds modules through the finders behind it and times their loaders"""
+        self.profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        state = self.profiler._import_state
+        if getattr(state, 'finding', False):
+            return None
+        if not hasattr(state, 'pending'):
+            state.pending = {}  # module -> [self seconds, cumulative seconds] while it loads
+        spec = self.profiler._timed_load(fullname, self._find_spec, fullname, path, target)
+
+        # File loaders are one instance per module, so patching the instance leaves the class
+        # (and isinstance checks) alone; shared, built-in and frozen loaders are not timed
+        loader = spec.loader if spec is not None else None
+        if loader is None or isinstance(loader, type) or getattr(loader, 'name', None) != fullname \
+                or not hasattr(loader, 'exec_module'):
+            state.pending.pop(fullname, None)
+            return spec
+
+        profiler = self.profiler
+        create_module = loader.create_module
+        exec_module = loader.exec_module
+
+        def timed_create(spec):
+            return profiler._timed_load(fullname, create_module, spec)
+
+        def timed_exec(module):
+            try:
+                return profiler._timed_load(fullname, exec_module, module)
+            finally:
+                del loader.create_module, loader.exec_module
+                self_time, cumulative = state.pending.pop(fullname, (0.0, 0.0))
+                profiler.imports.append((fullname, self_time, cumulative))
+
+        loader.create_module = timed_create
+        loader.exec_module = timed_exec
+        return spec
+
+    def _find_spec(self, fullname, path, target):
+        """Ask the finders behind this one"""
+        state = self.profiler._import_state
+        state.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is not self and hasattr(finder, 'find_spec'):
+                    spec = finder.find_spec(fullname, path, target)
+                    if spec is not None:
+                        return spec
+            return None
+        finally:
+            state.finding = False
@@ -1,11 +1,20 @@
-import ollama
+import os
+import sys
 import datetime
 import random
 import re
+
+# Generation goes through the desktop app's AIModel (one pooled, keep-alive Ollama client)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'spine_ai'))
+from adapter.ai_model import AIModel
+from adapter.response_cache import ResponseCache
 # with gemma3:4b
 class FixedAIAgent:
     def __init__(self):
         print("🤖 Fixed AI Agent Starting...")
+        # Tool decisions run at temperature 0.1 on a fixed prompt, so repeats come from the cache
+        # self.llm = AIModel('tinyllama', cache=ResponseCache(), cache_max_temperature=0.1)
+        self.llm = AIModel('gemma3:4b', cache=ResponseCache(), cache_max_temperature=0.1)
     
     def get_time(self):
         """Get current time"""
@@ -84,14 +93,13 @@ Just the single word, nothing else:
 """
         
         try:
-            response = ollama.generate(
-                # model='tinyllama',
-                model='gemma3:4b',
+            response = self.llm.generate(
                 prompt=decision_prompt,
-                options={'temperature': 0.1, 'max_tokens': 10}
+                temperature=0.1,
+                max_tokens=10  # one word is parsed, the cap only cuts off rambling
             )
             
-            decision = response['response'].strip().upper()
+            decision = response.strip().upper()
             print(f"🤔 AI chose: {decision}")
             
             # Extract any numbers or text for parameters
@@ -191,14 +199,12 @@ Respond naturally and helpfully:
 """
         
         try:
-            response = ollama.generate(
-                # model='tinyllama',
-                model='gemma3:4b',
+            response = self.llm.generate(
                 prompt=response_prompt,
-                options={'temperature': 0.6, 'max_tokens': 150}
+                temperature=0.6
             )
             
-            return response['response'].strip()
+            return response.strip()
             
         except Exception as e:
             return f"I had an error: {e}"
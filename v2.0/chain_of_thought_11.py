@@ -1,4 +1,11 @@
-import ollama
+import os
+import sys
+
+# Generation goes through the desktop app's AIModel (one pooled, keep-alive Ollama client)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'spine_ai'))
+from adapter.ai_model import AIModel
+
+llm = AIModel('tinyllama')
 
 def chain_of_thought_solver():
     print("🧠 Chain-of-Thought Problem Solver")
@@ -26,14 +33,11 @@ def chain_of_thought_solver():
     # 4. Step 2: [reasoning]
     # 5. Therefore, the answer is...
     
-    response = ollama.generate(model='tinyllama', prompt=cot_prompt,
-    options={
-        "temperature": 0.7,
-        "max_tokens": 150
-        # "stop": ["Therefore, the answer is:"]
-    }
-                               )
-    print(f"\n🔍 Chain-of-Thought Solution:\n{response['response']}")
+    response = llm.generate(prompt=cot_prompt,
+    temperature=0.7
+    # stop=["Therefore, the answer is:"]
+                            )
+    print(f"\n🔍 Chain-of-Thought Solution:\n{response}")
 
 
 
@@ -48,14 +52,14 @@ def self_improving_writer():
     # Step 1: Initial draft
     initial_prompt = f"Write a short article about {topic} (200-300 words)."
     
-    draft = ollama.generate(model='tinyllama', prompt=initial_prompt)
-    print(f"\n📄 Initial Draft:\n{draft['response']}\n")
+    draft = llm.generate(prompt=initial_prompt)
+    print(f"\n📄 Initial Draft:\n{draft}\n")
     
     # Step 2: Self-critique
     critique_prompt = f"""
     Analyze this article about {topic} and identify 3 specific areas for improvement:
     
-    Article: {draft['response']}
+    Article: {draft}
     
     Please critique in this format:
     1. Weakness 1: [specific issue]
@@ -65,22 +69,22 @@ def self_improving_writer():
     Be specific and constructive in your feedback.
     """
     
-    critique = ollama.generate(model='tinyllama', prompt=critique_prompt)
-    print(f"🔍 Self-Critique:\n{critique['response']}\n")
+    critique = llm.generate(prompt=critique_prompt)
+    print(f"🔍 Self-Critique:\n{critique}\n")
     
     # Step 3: Improved version
     improve_prompt = f"""
     Rewrite this article about {topic}, addressing these specific critiques:
     
-    Original Article: {draft['response']}
+    Original Article: {draft}
     
-    Critiques to Address: {critique['response']}
+    Critiques to Address: {critique}
     
     Create an improved version that fixes these issues while maintaining the core message.
     """
     
-    improved = ollama.generate(model='tinyllama', prompt=improve_prompt)
-    print(f"✨ Improved Article:\n{improved['response']}")
+    improved = llm.generate(prompt=improve_prompt)
+    print(f"✨ Improved Article:\n{improved}")
 
 if __name__ == "__main__":
     self_improving_writer()
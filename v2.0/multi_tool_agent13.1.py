@@ -1,13 +1,21 @@
-import ollama
+import os
+import sys
 import datetime
 import random
 import json
 import re
 
+# Generation goes through the desktop app's AIModel (one pooled, keep-alive Ollama client)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'spine_ai'))
+from adapter.ai_model import AIModel
+from adapter.conversation_memory import ConversationMemory
+
 class WorkingAIAgent:
     def __init__(self):
         print("🤖 Starting AI Agent...")
-        self.conversation_history = []
+        self.llm = AIModel('tinyllama')
+        # Recent turns verbatim, older ones summarized on a background thread
+        self.memory = ConversationMemory(self.llm, answer_tokens=300)
         
     def get_current_time(self):
         """Get current time"""
@@ -126,16 +134,19 @@ Based on the user's question and these tool results, provide a helpful response.
             else:
                 context = user_input
             
-            response = ollama.generate(
-                model='tinyllama',
-                prompt=context,
-                options={
-                    'temperature': 0.7,
-                    'max_tokens': 300
-                }
+            response = self.llm.generate(
+                prompt=self.memory.build_prompt(context),
+                temperature=0.7,
+                max_tokens=self.memory.answer_tokens,
+                stop=self.memory.stop
             )
             
-            return response['response']
+            if not response.startswith("Error:"):
+                # The user's own words are remembered, not the tool prompt
+                if self.memory.add_exchange(user_input, response):
+                    self.memory.start_background_summary()
+            
+            return response
             
         except Exception as e:
             return f"❌ AI Error: {e}"
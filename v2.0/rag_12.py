@@ -1,10 +1,17 @@
-import ollama
 import os
+import re
+import sys
 from pathlib import Path
 
+# Generation goes through the desktop app's AIModel (one pooled, keep-alive Ollama client)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'spine_ai'))
+from adapter.ai_model import AIModel
+
 class SimpleRAG:
     def __init__(self):
         self.documents = {}
+        self.term_index = {}  # word -> names of documents containing it
+        self.llm = AIModel('tinyllama')
         self.load_documents()
     
     def load_documents(self):
@@ -20,20 +27,27 @@ class SimpleRAG:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
                 self.documents[file_path.name] = content
+                
+                # Build the inverted index once, so queries don't rescan every document
+                for word in set(re.findall(r'\w+', content.lower())):
+                    self.term_index.setdefault(word, set()).add(file_path.name)
         
         print(f"Loaded {len(self.documents)} documents")
     
     def search_documents(self, query):
         """Simple keyword-based search"""
         relevant_docs = []
-        query_words = query.lower().split()
+        query_words = re.findall(r'\w+', query.lower())
         
-        for doc_name, content in self.documents.items():
-            content_lower = content.lower()
-            score = sum(1 for word in query_words if word in content_lower)
-            
+        # Count matching query words per document straight from the index
+        scores = {}
+        for word in query_words:
+            for doc_name in self.term_index.get(word, ()):
+                scores[doc_name] = scores.get(doc_name, 0) + 1
+        
+        for doc_name, score in scores.items():
             if score > 2:
-                relevant_docs.append((doc_name, content, score))
+                relevant_docs.append((doc_name, self.documents[doc_name], score))
         
         # Sort by relevance score
         relevant_docs.sort(key=lambda x: x[2], reverse=True)
@@ -66,13 +80,12 @@ class SimpleRAG:
         Answer:
         """
         
-        response = ollama.generate(
-            model='tinyllama',
+        response = self.llm.generate(
             prompt=rag_prompt,
-            options={'temperature': 0.3}  # Lower temperature for factual responses
+            temperature=0.3  # Lower temperature for factual responses
         )
         
-        return response['response']
+        return response
 
 def rag_demo():
     print("🔍 RAG Document Q&A System")
@@ -0,0 +1,245 @@
+import re
+import math
+import heapq
+from array import array
+from collections import Counter
+import numpy as np
+
+# Lowercased word tokens, so names and IDs like "ab-1234" match as "ab" + "1234"
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75):
+        """
+        Inverted index with Okapi BM25 scoring
+
+        A query only touches the posting lists of its own terms, so lookups
+        cost the number of matching documents, not the corpus size.
+        Documents can be added and removed one at a time.
+
+        Postings are kept in typed arrays (4-byte doc id + 2-byte term
+        frequency per entry) and every document keeps the ids of its terms
+        (4 bytes each), under 2 KB for a 200-word chunk. Doc ids must be
+        non-negative and fit in 32 bits, like chunk ids. Removing a
+        document only visits its own terms: its posting entries are
+        skipped at search time and compacted away once half of them are
+        dead, like the rows of ChunkStore.
+
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalization (0 = off, 1 = full)
+        """
+        self.k1 = k1
+        self.b = b
+        self.clear()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_lengths
+
+    def clear(self):
+        self.term_ids = {}  # term -> term id
+        self.posting_docs = []  # term id -> array of doc ids
+        self.posting_freqs = []  # term id -> array of term frequencies, parallel to posting_docs
+        self.doc_freqs = array('i')  # term id -> live documents containing it
+        self.doc_terms = {}  # doc_id -> array of its term ids
+        self.doc_lengths = {}  # doc_id -> number of tokens
+        self.total_length = 0
+        self.removed = set()  # removed doc ids whose posting entries are still in the arrays
+        self.postings_size = 0  # posting entries in the arrays, including removed ones
+        self.dead_postings = 0
+
+    @property
+    def num_terms(self):
+        return sum(1 for count in self.doc_freqs if count)
+
+    def add(self, doc_id, text):
+        """Index a document (re-adding an id replaces the old text)"""
+        if doc_id in self.doc_lengths:
+            self.remove([doc_id])
+        if doc_id in self.removed:
+            # Old entries of this id would count twice once it's live again
+            self._compact()
+
+        terms = tokenize(text)
+        doc_terms = array('i')
+        for term, count in Counter(terms).items():
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                term_id = self.term_ids[term] = len(self.posting_docs)
+                self.posting_docs.append(array('I'))
+                self.posting_freqs.append(array('H'))
+                self.doc_freqs.append(0)
+            self.posting_docs[term_id].append(doc_id)
+            self.posting_freqs[term_id].append(min(count, 0xFFFF))
+            self.doc_freqs[term_id] += 1
+            doc_terms.append(term_id)
+        self.doc_terms[doc_id] = doc_terms
+        self.doc_lengths[doc_id] = len(terms)
+        self.total_length += len(terms)
+        self.postings_size += len(doc_terms)
+
+    def remove(self, doc_ids):
+        """Drop documents from the index (cost grows with their own terms, not the vocabulary)"""
+        for doc_id in doc_ids:
+            if doc_id not in self.doc_lengths:
+                continue
+            self.total_length -= self.doc_lengths.pop(doc_id)
+            doc_terms = self.doc_terms.pop(doc_id)
+            for term_id in doc_terms:
+                self.doc_freqs[term_id] -= 1
+            self.removed.add(doc_id)
+            self.dead_postings += len(doc_terms)
+
+        if self.dead_postings and self.dead_postings * 2 >= self.postings_size:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the posting arrays without the entries of removed documents"""
+        if not self.removed:
+            return
+        removed = np.fromiter(self.removed, dtype=np.int64, count=len(self.removed))
+        for term_id, docs in enumerate(self.posting_docs):
+            if not docs:
+                continue
+            doc_ids = np.frombuffer(docs, dtype=np.uint32)
+            keep = ~np.isin(doc_ids, removed)
+            if keep.all():
+                continue
+            freqs = np.frombuffer(self.posting_freqs[term_id], dtype=np.uint16)
+            self.posting_docs[term_id] = array('I', doc_ids[keep].tobytes())
+            self.posting_freqs[term_id] = array('H', freqs[keep].tobytes())
+        self.postings_size -= self.dead_postings
+        self.dead_postings = 0
+        self.removed = set()
+
+    def search(self, query, top_k=10):
+        """
+        Rank documents for a query
+
+        Returns:
+            List of (doc_id, score), best first
+        """
+        if not self.doc_lengths:
+            return []
+
+        num_docs = len(self.doc_lengths)
+        doc_lengths = self.doc_lengths
+        removed = self.removed
+        # norm = base + scale * doc length
+        base = self.k1 * (1 - self.b)
+        scale = self.k1 * self.b * num_docs / self.total_length if self.total_length else 0.0
+        scores = {}
+
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None or not self.doc_freqs[term_id]:
+                continue
+            doc_freq = self.doc_freqs[term_id]
+            idf = math.log(1 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+            weight = idf * (self.k1 + 1)
+            for doc_id, freq in zip(self.posting_docs[term_id], self.posting_freqs[term_id]):
+                if doc_id in removed:
+                    continue
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * freq / (freq + base + scale * doc_lengths[doc_id])
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def save(self, path, exclude_ids=()):
+        """Write the index to a NumPy .npz file, leaving out exclude_ids"""
+        dead = self.removed | set(exclude_ids)
+        dead_ids = np.fromiter(dead, dtype=np.int64, count=len(dead))
+
+        # All posting lists back to back, filtered in one pass
+        terms = list(self.term_ids)
+        counts = np.fromiter((len(docs) for docs in self.posting_docs), dtype=np.int64, count=len(terms))
+        docs = np.frombuffer(b''.join(postings.tobytes() for postings in self.posting_docs), dtype=np.uint32)
+        freqs = np.frombuffer(b''.join(postings.tobytes() for postings in self.posting_freqs), dtype=np.uint16)
+        if dead:
+            keep = ~np.isin(docs, dead_ids)
+            docs = docs[keep]
+            freqs = freqs[keep]
+            counts = np.bincount(np.repeat(np.arange(len(terms)), counts)[keep], minlength=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        kept = [doc_id for doc_id in self.doc_lengths if doc_id not in dead]
+        with open(path, 'wb') as file:
+            np.savez(
+                file,
+                params=np.array([self.k1, self.b]),
+                # \w+ tokens never contain a newline
+                terms=np.frombuffer('\n'.join(terms).encode('utf-8'), dtype=np.uint8),
+                term_offsets=offsets,
+                posting_docs=docs,
+                posting_freqs=freqs,
+                doc_ids=np.array(kept, dtype=np.int64),
+                doc_lengths=np.array([self.doc_lengths[doc_id] for doc_id in kept], dtype=np.int64)
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            k1, b = data['params'].tolist()
+            index = cls(k1=k1, b=b)
+            raw_terms = data['terms'].tobytes().decode('utf-8')
+            terms = raw_terms.split('\n') if raw_terms else []
+            offsets = data['term_offsets']
+            posting_docs = data['posting_docs']
+            posting_freqs = data['posting_freqs']
+            doc_ids = data['doc_ids']
+            doc_lengths = data['doc_lengths']
+
+        index.term_ids = {term: term_id for term_id, term in enumerate(terms)}
+        index.posting_docs = [array('I', posting_docs[start:end].tobytes())
+                              for start, end in zip(offsets[:-1], offsets[1:])]
+        index.posting_freqs = [array('H', posting_freqs[start:end].tobytes())
+                               for start, end in zip(offsets[:-1], offsets[1:])]
+        index.doc_freqs = array('i', np.diff(offsets).astype(np.int32).tobytes())
+        index.doc_lengths = dict(zip(doc_ids.tolist(), doc_lengths.tolist()))
+        index.total_length = int(doc_lengths.sum())
+        index.postings_size = len(posting_docs)
+
+        # Term ids per document, from the term-major postings
+        term_of_entry = np.repeat(np.arange(len(terms), dtype=np.int32), np.diff(offsets))
+        order = np.argsort(posting_docs, kind='stable')
+        sorted_docs = posting_docs[order]
+        sorted_terms = term_of_entry[order]
+        starts = np.flatnonzero(np.r_[True, sorted_docs[1:] != sorted_docs[:-1]]) if len(sorted_docs) else []
+        ends = list(starts[1:]) + [len(sorted_docs)]
+        for start, end in zip(starts, ends):
+            index.doc_terms[int(sorted_docs[start])] = array('i', sorted_terms[start:end].tobytes())
+        for doc_id in index.doc_lengths:
+            index.doc_terms.setdefault(doc_id, array('i'))
+        return index
+
+
+def reciprocal_rank_fusion(rankings, k=60, top_k=None):
+    """
+    Merge ranked lists with reciprocal rank fusion
+
+    Each list adds 1 / (k + rank) to the ids it contains, so results that
+    rank well in several lists win without having to compare raw scores.
+
+    Args:
+        rankings: Lists of ids, best first
+        k: Damping constant (60 in the original paper)
+        top_k: Number of results to keep (None = all)
+
+    Returns:
+        List of (id, fused score), best first
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return fused[:top_k] if top_k is not None else fused
@@ -0,0 +1,240 @@
+import os
+import mmap
+import hashlib
+import numpy as np
+
+# One fixed-size row per chunk, the text itself stays in the source file
+CHUNK_DTYPE = np.dtype([
+    ('chunk_id', np.int64),   # stable id, also the FAISS id
+    ('file_id', np.int32),    # position in ChunkStore.files, -1 = deleted
+    ('chunk_no', np.int32),   # position of the chunk inside its file
+    ('offset', np.int64),     # byte offset of the chunk in the file
+    ('length', np.int32),     # byte length of the chunk
+    ('start', np.int64),      # character offset of the chunk (chunk_start in metadata)
+    ('text_hash', np.uint64), # hash of the chunk text, to spot unchanged chunks
+])
+
+
+def text_hash64(text):
+    """Short content hash stored per chunk"""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class ChunkStore:
+    def __init__(self, capacity=1024):
+        """
+        Compact chunk table backed by a NumPy structured array
+
+        Chunk text is sliced on demand from a memory-mapped copy of the
+        source file, so the store only holds ~44 bytes per chunk. Rows are
+        kept sorted by chunk_id (ids only ever grow), so lookups are a
+        binary search.
+
+        Args:
+            capacity: Initial number of rows to allocate
+        """
+        self.rows = np.zeros(capacity, dtype=CHUNK_DTYPE)
+        self.size = 0  # rows in use, including deleted ones
+        self.deleted = 0
+        self.files = []  # file_id -> absolute path
+        self.names = []  # file_id -> name the file is indexed under (its filename unless set)
+        self.file_ids = {}  # name -> file_id
+        self._maps = {}  # file_id -> open mmap
+
+    def __len__(self):
+        return self.size - self.deleted
+
+    def __contains__(self, chunk_id):
+        return self._row(chunk_id) is not None
+
+    # --- files ---
+
+    def file_id(self, file_path, name=None):
+        """
+        Id of a file, registering it on first use
+
+        Args:
+            file_path: Where the file is now (updated if it moved)
+            name: Key the file is indexed under (defaults to its filename)
+        """
+        name = name or os.path.basename(file_path)
+        if name not in self.file_ids:
+            self.file_ids[name] = len(self.files)
+            self.files.append(os.path.abspath(file_path))
+            self.names.append(name)
+        else:
+            self.files[self.file_ids[name]] = os.path.abspath(file_path)
+        return self.file_ids[name]
+
+    def file_data(self, file_id):
+        """Memory-mapped bytes of a file (empty bytes for empty files)"""
+        if file_id not in self._maps:
+            with open(self.files[file_id], 'rb') as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return b''
+                self._maps[file_id] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._maps[file_id]
+
+    def release_file(self, name):
+        """Close the mapping of a file, e.g. because it changed on disk"""
+        file_id = self.file_ids.get(name)
+        mapped = self._maps.pop(file_id, None)
+        if mapped is not None:
+            mapped.close()
+
+    def discard_file(self, name):
+        """Close a file and forget its name, e.g. a staged version that was given up (its chunks must be removed)"""
+        self.release_file(name)
+        self.file_ids.pop(name, None)
+
+    def swap_file(self, name, staged_name, moves):
+        """
+        Make a new version of a file, staged under another name, the one indexed as name
+
+        Chunks added under staged_name move over to name, and chunks of the
+        old version that are unchanged in the new one are moved to their new
+        position. Old chunks that are not moved must be removed first, they
+        would point into the new file.
+
+        Args:
+            name: Name the file is indexed under
+            staged_name: Name the chunks of the new version were added under
+            moves: List of (chunk_id, chunk_no, offset, length, start) for the unchanged chunks
+        """
+        staged_id = self.file_ids.pop(staged_name)
+        file_id = self.file_ids.get(name)
+        if file_id is None:
+            # The old version had no chunks, the staged file just takes the name
+            self.file_ids[name] = staged_id
+            self.names[staged_id] = name
+            return
+
+        self.release_file(name)
+        rows = self.rows[:self.size]
+        rows['file_id'][rows['file_id'] == staged_id] = file_id
+        if moves:
+            moves = np.array(moves, dtype=np.int64)
+            positions = np.searchsorted(rows['chunk_id'], moves[:, 0])
+            found = positions < self.size
+            found[found] = rows['chunk_id'][positions[found]] == moves[found, 0]
+            positions, moves = positions[found], moves[found]
+            rows['chunk_no'][positions] = moves[:, 1]
+            rows['offset'][positions] = moves[:, 2]
+            rows['length'][positions] = moves[:, 3]
+            rows['start'][positions] = moves[:, 4]
+
+        self.files[file_id] = self.files[staged_id]
+        mapped = self._maps.pop(staged_id, None)
+        if mapped is not None:
+            self._maps[file_id] = mapped
+
+    def filenames(self, chunk_ids):
+        """Names (file_ids keys) of the files the given chunks belong to"""
+        if not chunk_ids:
+            return set()
+        rows = self.rows[:self.size]
+        rows = rows[np.isin(rows['chunk_id'], np.fromiter(chunk_ids, dtype=np.int64)) & (rows['file_id'] >= 0)]
+        return {self.names[file_id] for file_id in np.unique(rows['file_id']).tolist()}
+
+    def file_chunk_ids(self, name):
+        """Ids of all live chunks of a file, in file order"""
+        file_id = self.file_ids.get(name)
+        if file_id is None:
+            return []
+        rows = self.rows[:self.size]
+        rows = rows[rows['file_id'] == file_id]
+        return rows['chunk_id'][np.argsort(rows['chunk_no'], kind='stable')].tolist()
+
+    # --- rows ---
+
+    def add(self, chunk_id, file_id, chunk_no, offset, length, start, text_hash):
+        """Append a chunk row, chunk ids must be larger than every id added before"""
+        if self.size and chunk_id <= self.rows['chunk_id'][self.size - 1]:
+            raise ValueError(f"Chunk id {chunk_id} is not increasing")
+        if self.size == len(self.rows):
+            self.rows = np.resize(self.rows, len(self.rows) * 2)
+        self.rows[self.size] = (chunk_id, file_id, chunk_no, offset, length, start, text_hash)
+        self.size += 1
+
+    def remove(self, chunk_ids):
+        """Mark chunks as deleted, compacting the table once half of it is dead"""
+        for chunk_id in chunk_ids:
+            row = self._row(chunk_id)
+            if row is not None:
+                self.rows['file_id'][row] = -1
+                self.deleted += 1
+
+        if self.deleted and self.deleted * 2 >= self.size:
+            live = self.rows[:self.size][self.rows['file_id'][:self.size] >= 0]
+            self.rows = np.zeros(max(1024, len(live) * 2), dtype=CHUNK_DTYPE)
+            self.rows[:len(live)] = live
+            self.size = len(live)
+            self.deleted = 0
+
+    def clear(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self.__init__()
+
+    def ids(self):
+        """All live chunk ids"""
+        rows = self.rows[:self.size]
+        return rows['chunk_id'][rows['file_id'] >= 0].tolist()
+
+    def _row(self, chunk_id):
+        position = int(np.searchsorted(self.rows['chunk_id'][:self.size], chunk_id))
+        if position < self.size and self.rows['chunk_id'][position] == chunk_id \
+                and self.rows['file_id'][position] >= 0:
+            return position
+        return None
+
+    # --- text and metadata ---
+
+    def get_text(self, chunk_id):
+        """Chunk text with whitespace collapsed, read from the mapped source file"""
+        row = self.rows[self._row(chunk_id)]
+        data = self.file_data(int(row['file_id']))
+        raw = data[int(row['offset']):int(row['offset']) + int(row['length'])]
+        return ' '.join(raw.decode('utf-8', errors='replace').split())
+
+    def get_texts(self, chunk_ids):
+        return [self.get_text(chunk_id) for chunk_id in chunk_ids]
+
+    def get_metadata(self, chunk_id, text=None):
+        """Metadata dict in the same shape TinyLlamaRAG always returned"""
+        row = self.rows[self._row(chunk_id)]
+        text = self.get_text(chunk_id) if text is None else text
+        return {
+            'filename': os.path.basename(self.files[int(row['file_id'])]),
+            'chunk_id': int(row['chunk_no']),
+            'chunk_start': int(row['start']),
+            'chunk_length': len(text)
+        }
+
+    def text_hashes(self, chunk_ids):
+        return [int(self.rows[self._row(chunk_id)]['text_hash']) for chunk_id in chunk_ids]
+
+    # --- persistence ---
+
+    def save(self, path, exclude_ids=()):
+        """Write live rows to a .npy file (files are saved by the caller)"""
+        rows = self.rows[:self.size]
+        keep = rows['file_id'] >= 0
+        if exclude_ids:
+            keep &= ~np.isin(rows['chunk_id'], np.fromiter(exclude_ids, dtype=np.int64))
+        with open(path, 'wb') as file:
+            np.save(file, rows[keep])
+
+    def load(self, path, files, names=None):
+        """Read rows written by save() together with the saved file list (and names, default filenames)"""
+        self.clear()
+        rows = np.load(path)
+        self.rows = np.zeros(max(1024, len(rows) * 2), dtype=CHUNK_DTYPE)
+        self.rows[:len(rows)] = rows
+        self.size = len(rows)
+        self.files = list(files)
+        self.names = list(names) if names is not None else [os.path.basename(path) for path in self.files]
+        self.file_ids = {name: i for i, name in enumerate(self.names)}
+
+    def nbytes(self):
+        return self.rows.nbytes
@@ -0,0 +1,236 @@
+import os
+import re
+import mmap
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# Kept free of torch / faiss imports so ingestion worker processes start fast
+
+WORD_PATTERN = re.compile(rb'\S+')
+
+# UTF-8 continuation bytes, every other byte starts a character
+CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+
+
+def iter_chunk_spans(data, chunk_size, overlap):
+    """
+    Find overlapping word chunks in a bytes-like buffer (e.g. an mmap)
+    
+    Only word positions are kept, never the text, so memory stays at one
+    chunk worth of offsets however big the buffer is.
+    
+    Yields:
+        (byte_start, byte_end, char_start) per chunk
+    """
+    step = chunk_size - overlap
+    starts = []
+    ends = []
+    emitted = False
+    # Character offset of byte position last_byte, advanced chunk by chunk
+    last_byte = 0
+    last_char = 0
+    
+    def char_offset(byte_offset):
+        nonlocal last_byte, last_char
+        segment = data[last_byte:byte_offset]
+        last_char += len(segment.translate(None, CONTINUATION_BYTES))
+        last_byte = byte_offset
+        return last_char
+    
+    for match in WORD_PATTERN.finditer(data):
+        starts.append(match.start())
+        ends.append(match.end())
+        if len(starts) == chunk_size:
+            yield starts[0], ends[-1], char_offset(starts[0])
+            del starts[:step]
+            del ends[:step]
+            emitted = True
+    
+    # The tail is only a new chunk if it has words the last chunk didn't cover
+    if starts and (not emitted or len(starts) > overlap):
+        yield starts[0], ends[-1], char_offset(starts[0])
+
+
+def make_chunk_tokenizer(tokenizer):
+    """
+    Private copy of a fast tokenizer for token chunking
+    
+    The copy has truncation and padding switched off, and the embedding
+    model can keep using the original from another thread.
+    
+    Args:
+        tokenizer: A Hugging Face fast tokenizer or a tokenizers.Tokenizer
+    """
+    backend = getattr(tokenizer, 'backend_tokenizer', tokenizer)
+    if not hasattr(backend, 'encode_batch'):
+        raise ValueError("Token chunking needs a fast (Rust) tokenizer")
+    backend = type(backend).from_str(backend.to_str())
+    backend.no_truncation()
+    backend.no_padding()
+    return backend
+
+
+def _iter_blocks(data, block_bytes):
+    """Split a buffer into blocks that end on whitespace, so no token spans two blocks"""
+    start = 0
+    size = len(data)
+    while start < size:
+        end = min(start + block_bytes, size)
+        if end < size:
+            cut = max(data.rfind(b'\n', start, end), data.rfind(b' ', start, end))
+            if cut > start:
+                end = cut + 1
+            else:
+                # No whitespace at all, at least don't cut a character in half
+                while end > start + 1 and data[end] & 0xC0 == 0x80:
+                    end -= 1
+        yield start, data[start:end]
+        start = end
+
+
+def _decode_block(raw):
+    """
+    Decode a block and map character positions to byte positions
+    
+    Returns:
+        (text, char_to_byte) where char_to_byte has one extra entry for the block end
+    """
+    try:
+        text = raw.decode('utf-8')
+        view = np.frombuffer(raw, dtype=np.uint8)
+        char_to_byte = np.flatnonzero(view & 0xC0 != 0x80)
+    except UnicodeDecodeError:
+        # Invalid bytes become one U+FFFD each, so positions still line up
+        text = raw.decode('utf-8', errors='surrogateescape')
+        lengths = [1 if '\udc80' <= char <= '\udcff' else len(char.encode('utf-8')) for char in text]
+        char_to_byte = np.cumsum([0] + lengths[:-1], dtype=np.int64)
+        text = re.sub('[\udc80-\udcff]', '\ufffd', text)
+    return text, np.append(char_to_byte, len(raw))
+
+
+def iter_token_spans(data, tokenizer, chunk_size, overlap, block_bytes=1 << 16, blocks_per_batch=64):
+    """
+    Find overlapping chunks of exactly chunk_size tokens (the last one may be shorter)
+    
+    The buffer is cut into whitespace-aligned blocks that are tokenized
+    in batches by the Rust tokenizer, and chunk boundaries come straight
+    from the token offsets with NumPy, so no Python loop runs per token.
+    
+    Args:
+        data: bytes-like buffer (e.g. an mmap) with UTF-8 text
+        tokenizer: Tokenizer from make_chunk_tokenizer
+        chunk_size: Tokens per chunk (without special tokens)
+        overlap: Tokens shared by neighbouring chunks
+        block_bytes: Bytes per tokenizer input
+        blocks_per_batch: Blocks tokenized per encode_batch call
+    
+    Yields:
+        (byte_start, byte_end, char_start) per chunk
+    """
+    step = chunk_size - overlap
+    # Offsets of tokens not yet covered by a full chunk
+    byte_starts = np.empty(0, dtype=np.int64)
+    byte_ends = np.empty(0, dtype=np.int64)
+    char_starts = np.empty(0, dtype=np.int64)
+    char_base = 0
+    emitted = False
+    blocks = _iter_blocks(data, block_bytes)
+    
+    while True:
+        batch = [block for _, block in zip(range(blocks_per_batch), blocks)]
+        if not batch:
+            break
+        
+        decoded = [_decode_block(raw) for _, raw in batch]
+        encodings = tokenizer.encode_batch([text for text, _ in decoded], add_special_tokens=False)
+        
+        new_byte_starts = [byte_starts]
+        new_byte_ends = [byte_ends]
+        new_char_starts = [char_starts]
+        for (byte_base, _), (text, char_to_byte), encoding in zip(batch, decoded, encodings):
+            offsets = np.array(encoding.offsets, dtype=np.int64).reshape(-1, 2)
+            new_byte_starts.append(byte_base + char_to_byte[offsets[:, 0]])
+            new_byte_ends.append(byte_base + char_to_byte[offsets[:, 1]])
+            new_char_starts.append(char_base + offsets[:, 0])
+            char_base += len(text)
+        byte_starts = np.concatenate(new_byte_starts)
+        byte_ends = np.concatenate(new_byte_ends)
+        char_starts = np.concatenate(new_char_starts)
+        
+        if len(byte_starts) >= chunk_size:
+            count = (len(byte_starts) - chunk_size) // step + 1
+            firsts = np.arange(count) * step
+            lasts = firsts + chunk_size - 1
+            yield from zip(byte_starts[firsts].tolist(), byte_ends[lasts].tolist(), char_starts[firsts].tolist())
+            byte_starts = byte_starts[count * step:]
+            byte_ends = byte_ends[count * step:]
+            char_starts = char_starts[count * step:]
+            emitted = True
+    
+    # Same tail rule as word chunks: only if it has tokens the last chunk didn't cover
+    if len(byte_starts) and (not emitted or len(byte_starts) > overlap):
+        yield int(byte_starts[0]), int(byte_ends[-1]), int(char_starts[0])
+
+
+def iter_file_spans(file_path, chunk_size, overlap, tokenizer=None):
+    """
+    Chunk spans of a file, scanned through a read-only memory map
+    
+    Chunks are counted in words, or in tokens when a tokenizer is given.
+    """
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if tokenizer is not None:
+                yield from iter_token_spans(data, tokenizer, chunk_size, overlap)
+            else:
+                yield from iter_chunk_spans(data, chunk_size, overlap)
+
+
+def chunk_file(file_path, chunk_size, overlap):
+    """Chunk spans of a whole file (runs in ingestion worker processes)"""
+    return file_path, list(iter_file_spans(file_path, chunk_size, overlap))
+
+
+def chunk_files_parallel(file_paths, chunk_size, overlap, num_workers):
+    """
+    Chunk whole files in a pool of worker processes
+    
+    Only a couple of files per worker are in flight, so a slow consumer
+    holds back the workers instead of piling up finished span lists.
+    
+    Workers are always spawned, never forked: the pool is started from a
+    background thread while the main thread may be running torch / OpenMP,
+    and a forked child can inherit their locks held and deadlock. Spawned
+    workers import this module to run chunk_file and re-import the main
+    script as __mp_main__, so scripts that start the pool should keep
+    torch / faiss imports out of that re-import.
+    
+    Yields:
+        (file_path, spans, error) per file, in completion order
+    """
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        remaining = iter(file_paths)
+        in_flight = {}
+        
+        def submit_next():
+            file_path = next(remaining, None)
+            if file_path is not None:
+                in_flight[pool.submit(chunk_file, file_path, chunk_size, overlap)] = file_path
+        
+        for _ in range(num_workers * 2):
+            submit_next()
+        
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path = in_flight.pop(future)
+                submit_next()
+                try:
+                    _, spans = future.result()
+                except Exception as e:
+                    yield file_path, None, e
+                    continue
+                yield file_path, spans, None
@@ -0,0 +1,252 @@
+import os
+import time
+import faiss
+import numpy as np
+
+# Vector counts where the automatic policy switches to the next backend
+HNSW_MIN_VECTORS = 100_000
+IVFPQ_MIN_VECTORS = 2_000_000
+
+# FAISS wants ~39 training points per centroid, each 8-bit PQ codebook has 256
+PQ_MIN_TRAINING_VECTORS = 39 * 256
+
+
+class FlatBackend:
+    """Exact inner product search, cost grows linearly with the corpus"""
+    name = "flat"
+
+    def __init__(self, dimension=None, index=None):
+        self.index = index if index is not None else faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal
+
+    @property
+    def is_trained(self):
+        return True
+
+    def train(self, vectors):
+        pass
+
+    def add_with_ids(self, vectors, ids):
+        self.index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+
+    def remove_ids(self, ids):
+        self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+
+    def search(self, queries, top_k, **search_params):
+        return self.index.search(queries, top_k)
+
+    def save(self, path):
+        faiss.write_index(self.index, path)
+
+
+class HNSWBackend:
+    """Graph index with sub-linear search, tuned per query with ef_search"""
+    name = "hnsw"
+
+    def __init__(self, dimension=None, index=None, m=32, ef_construction=200, ef_search=64):
+        if index is None:
+            hnsw = faiss.IndexHNSWFlat(dimension, m, faiss.METRIC_INNER_PRODUCT)
+            hnsw.hnsw.efConstruction = ef_construction
+            index = faiss.IndexIDMap2(hnsw)
+        self.index = index
+        self.ef_search = ef_search
+        # HNSW can't delete vectors, removed ids are filtered out at search time
+        self.deleted_ids = set()
+        self._selector = None
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal - len(self.deleted_ids)
+
+    @property
+    def is_trained(self):
+        return True
+
+    def train(self, vectors):
+        pass
+
+    def add_with_ids(self, vectors, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        if self.deleted_ids.intersection(ids.tolist()):
+            raise ValueError("HNSW backend can't re-add a removed chunk id")
+        self.index.add_with_ids(vectors, ids)
+
+    def remove_ids(self, ids):
+        self.deleted_ids.update(int(i) for i in ids)
+        self._selector = None
+
+    def search(self, queries, top_k, ef_search=None, **search_params):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = max(ef_search or self.ef_search, top_k)
+        if self.deleted_ids:
+            if self._selector is None:
+                # Keep the batch selector alive, IDSelectorNot only holds a pointer to it
+                batch = faiss.IDSelectorBatch(np.array(sorted(self.deleted_ids), dtype=np.int64))
+                self._selector = (batch, faiss.IDSelectorNot(batch))
+            params.sel = self._selector[1]
+        return self.index.search(queries, top_k, params=params)
+
+    def save(self, path):
+        faiss.write_index(self.index, path)
+        np.save(path + ".deleted.npy", np.array(sorted(self.deleted_ids), dtype=np.int64))
+
+
+class IVFPQBackend:
+    """Compressed inverted-file index for very large corpora, tuned per query with nprobe"""
+    name = "ivfpq"
+
+    def __init__(self, dimension=None, index=None, num_vectors=0, nprobe=16):
+        if index is None:
+            # ~4*sqrt(n) lists, but keep at least 39 training points per list
+            nlist = max(1, min(int(4 * np.sqrt(max(num_vectors, 1))), num_vectors // 39))
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, _pq_subquantizers(dimension), 8,
+                                     faiss.METRIC_INNER_PRODUCT)
+        self.index = index
+        self.nprobe = nprobe
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal
+
+    @property
+    def is_trained(self):
+        return self.index.is_trained
+
+    @property
+    def training_size(self):
+        """Vectors to collect before training, enough for both the coarse lists and the PQ codebooks"""
+        return max(39 * self.index.nlist, PQ_MIN_TRAINING_VECTORS)
+
+    def train(self, vectors):
+        self.index.train(vectors)
+
+    def add_with_ids(self, vectors, ids):
+        self.index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+
+    def remove_ids(self, ids):
+        self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+
+    def search(self, queries, top_k, nprobe=None, **search_params):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = min(nprobe or self.nprobe, self.index.nlist)
+        return self.index.search(queries, top_k, params=params)
+
+    def save(self, path):
+        faiss.write_index(self.index, path)
+
+
+BACKENDS = {
+    FlatBackend.name: FlatBackend,
+    HNSWBackend.name: HNSWBackend,
+    IVFPQBackend.name: IVFPQBackend,
+}
+
+
+def _pq_subquantizers(dimension):
+    """Largest sub-quantizer count <= 64 that divides the dimension, aiming for 8 dims each"""
+    for m in range(min(64, max(1, dimension // 8)), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def choose_backend(num_vectors):
+    """Pick an index type for a corpus size"""
+    if num_vectors >= IVFPQ_MIN_VECTORS:
+        return IVFPQBackend.name
+    if num_vectors >= HNSW_MIN_VECTORS:
+        return HNSWBackend.name
+    return FlatBackend.name
+
+
+def create_backend(name, dimension, num_vectors):
+    """
+    Create an empty index backend
+
+    Args:
+        name: 'flat', 'hnsw', 'ivfpq' or 'auto'
+        dimension: Embedding dimension
+        num_vectors: Expected number of vectors (drives 'auto' and IVF sizing)
+    """
+    if name == "auto":
+        name = choose_backend(num_vectors)
+    if name == IVFPQBackend.name and num_vectors < PQ_MIN_TRAINING_VECTORS:
+        print(f"⚠️ Only {num_vectors} vectors, too few to train IVF-PQ - using flat index")
+        name = FlatBackend.name
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown index backend '{name}', use one of: auto, {', '.join(BACKENDS)}")
+    if name == IVFPQBackend.name:
+        return IVFPQBackend(dimension, num_vectors=num_vectors)
+    return BACKENDS[name](dimension)
+
+
+def load_backend(path):
+    """Read an index written by a backend's save() and wrap it in the right backend"""
+    index = faiss.read_index(path)
+
+    if isinstance(index, faiss.IndexIVFPQ):
+        return IVFPQBackend(index=index)
+
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else None
+    if isinstance(inner, faiss.IndexHNSW):
+        backend = HNSWBackend(index=index)
+        deleted_path = path + ".deleted.npy"
+        if os.path.exists(deleted_path):
+            backend.deleted_ids = set(np.load(deleted_path).tolist())
+        return backend
+
+    return FlatBackend(index=index)
+
+
+def recall_report(backend, vectors, ids, queries, top_k=10, **search_params):
+    """
+    Measure recall@k and per-query latency of a backend against exact flat search
+
+    Args:
+        backend: Backend to evaluate (already filled with the vectors)
+        vectors: The indexed vectors
+        ids: Ids of the indexed vectors
+        queries: Query vectors
+        top_k: k for recall@k
+        search_params: Passed to backend.search (ef_search, nprobe)
+
+    Returns:
+        Dict with recall@k and p50/p99 search latency in ms for the backend and exact search
+    """
+    exact = FlatBackend(vectors.shape[1])
+    exact.add_with_ids(vectors, ids)
+
+    def timed_search(index, **params):
+        latencies = []
+        found = []
+        for query in queries:
+            start = time.perf_counter()
+            _, indices = index.search(query.reshape(1, -1), top_k, **params)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append(indices[0])
+        return found, latencies
+
+    exact_results, exact_latencies = timed_search(exact)
+    results, latencies = timed_search(backend, **search_params)
+
+    hits = sum(
+        len(set(truth[truth != -1].tolist()) & set(got[got != -1].tolist()))
+        for truth, got in zip(exact_results, results)
+    )
+    possible = sum(int((truth != -1).sum()) for truth in exact_results)
+
+    return {
+        'backend': backend.name,
+        'search_params': search_params,
+        'num_vectors': int(len(vectors)),
+        'num_queries': int(len(queries)),
+        f'recall@{top_k}': hits / possible if possible else 1.0,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'exact_p50_ms': float(np.percentile(exact_latencies, 50)),
+        'exact_p99_ms': float(np.percentile(exact_latencies, 99)),
+    }
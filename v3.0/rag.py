@@ -1,182 +1,1230 @@
 import os
-import ollama
-import faiss
+import sys
+
+# AIModel and the startup profiler are shared with the spine_ai desktop app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'spine_ai'))
+from utils.startup_profiler import StartupProfiler, profile_path_from_argv
+
+# --profile-startup has to hook imports before the heavy ones below
+STARTUP_PROFILER = StartupProfiler()
+if __name__ == "__main__" and profile_path_from_argv(sys.argv):
+    STARTUP_PROFILER.start_import_tracking()
+STARTUP_PROFILER.begin("imports")
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import re
 import json
+import hashlib
+import shutil
+import tempfile
+import queue
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
+from embedding_cache import EmbeddingCache, DEFAULT_CACHE_PATH, normalize_text
+from chunking import iter_file_spans, chunk_files_parallel, make_chunk_tokenizer
+from chunk_store import ChunkStore, text_hash64
+from bm25_index import BM25Index, reciprocal_rank_fusion
+
+# Spawned chunking workers (Windows, macOS) re-run this script as __mp_main__
+# but only need chunking.chunk_file, so they skip loading torch and faiss
+if __name__ != "__mp_main__":
+    import faiss
+    from sentence_transformers import SentenceTransformer
+    from index_backends import BACKENDS, create_backend, load_backend, recall_report
+    from semantic_cache import SemanticCache
+
+# Generation goes through the desktop app's AIModel (one pooled, keep-alive Ollama client)
+from adapter.ai_model import AIModel
+from adapter.response_cache import ResponseCache
+
+STARTUP_PROFILER.end("imports")
+
+# Bump when the saved index layout changes so old indexes get rebuilt
+INDEX_FORMAT_VERSION = 7
 
 class TinyLlamaRAG:
-    def __init__(self, model_name="tinyllama", embedding_model="all-MiniLM-L6-v2"):
+    def __init__(self, model_name="tinyllama", embedding_model="all-MiniLM-L6-v2", index_dir="rag_index",
+                 embedding_cache_path=DEFAULT_CACHE_PATH, index_backend="auto", query_cache_size=1024,
+                 chunk_unit="words", hybrid_search=True, llm=None, semantic_cache_threshold=0.92,
+                 semantic_cache_size=512):
         """
         Initialize RAG system with and FAISS
         
         Args:
             model_name: Ollama model name (tinyllama, gemma:2b, etc.)
             embedding_model: SentenceTransformer model for embeddings
+            index_dir: Folder where the FAISS index, chunks and copies of the indexed files are saved
+                       (None = don't persist, the copies go to a temporary folder)
+            embedding_cache_path: SQLite file for cached chunk embeddings (None = no cache)
+            index_backend: Vector index type - flat, hnsw, ivfpq or auto (picked by corpus size)
+            query_cache_size: Number of query embeddings kept in memory (0 = off)
+            chunk_unit: Count chunk_size/overlap in "words" or in embedding model "tokens"
+            hybrid_search: Fuse BM25 keyword hits with the vector search results by default
+            llm: Shared AIModel to generate with (model_name is then ignored)
+            semantic_cache_threshold: Question similarity needed to reuse an earlier answer (None = off)
+            semantic_cache_size: Number of answers kept in the semantic cache
         """
         print("🚀 Initializing TinyLlama RAG System...")
         
-        self.model_name = model_name
+        self.llm = llm if llm is not None else AIModel(model_name)
+        self.embedding_model_name = embedding_model
         self.embedding_model = SentenceTransformer(embedding_model)
-        self.documents = []
-        self.chunks = []
-        self.chunk_metadata = []
-        self.faiss_index = None
+        self.index_dir = index_dir
+        # Copies of the indexed files, chunk text is read from these (see _snapshot_file)
+        if index_dir:
+            self.files_dir = os.path.join(index_dir, "files")
+        else:
+            self._files_tmp = tempfile.TemporaryDirectory(prefix="rag_files_", ignore_cleanup_errors=True)
+            self.files_dir = self._files_tmp.name
+        self.documents = {}  # document name (the filename unless add_document got a name) -> document info
+        self.chunk_store = ChunkStore()  # chunk id -> file offsets, text is read from the files
+        self.next_chunk_id = 0
+        self.pending_chunk_ids = []  # chunks that still need embedding
+        # Embedded chunks held back until an index that needs training has a big enough sample
+        self.training_ids = []
+        self.training_vectors = []
+        self.index_backend = index_backend
+        self.faiss_index = None  # index backend, see index_backends.py
+        self.file_hashes = {}  # document name -> sha256 of the content that is indexed
+        self.chunk_params = None  # (chunk_size, overlap) used for the indexed chunks
+        self.chunk_unit = chunk_unit
+        self.tokenizer = None  # private tokenizer copy for token chunking
+        if chunk_unit == "tokens":
+            self.tokenizer = make_chunk_tokenizer(self.embedding_model.tokenizer)
+        elif chunk_unit != "words":
+            raise ValueError(f"Unknown chunk unit '{chunk_unit}', use 'words' or 'tokens'")
+        self.embedding_cache = EmbeddingCache(embedding_cache_path) if embedding_cache_path else None
+        self.query_cache = OrderedDict()  # normalized query -> normalized query vector (LRU order)
+        self.query_cache_size = query_cache_size
+        self.bm25_index = BM25Index()  # chunk id -> keyword postings, fused with FAISS results
+        self.hybrid_search = hybrid_search
+        self.query_cache_hits = 0
+        self.query_cache_misses = 0
+        # Bumped on every index change, cached answers are only valid for the version they saw
+        self.index_version = 0
+        self.semantic_cache = None
+        if semantic_cache_threshold is not None:
+            self.semantic_cache = SemanticCache(self.embedding_model.get_sentence_embedding_dimension(),
+                                                semantic_cache_threshold, semantic_cache_size)
+        # Guards index state, so searches can run between the batches of a background ingest
+        self.lock = threading.RLock()
         
-        print(f"✅ Using model: {model_name}")
+        print(f"✅ Using model: {self.model_name}")
         print(f"✅ Using embeddings: {embedding_model}")
     
-    def load_documents_from_folder(self, folder_path="documents", chunk_size=500, overlap=50):
+    @property
+    def model_name(self):
+        return self.llm.model_name
+    
+    @model_name.setter
+    def model_name(self, model_name):
+        self.llm.change_model(model_name)
+    
+    def save_index(self, index_dir=None):
         """
-        Load all .txt files from folder and split into chunks
+        Save FAISS index, chunks, metadata and file hash manifest to disk
         
         Args:
-            folder_path: Path to folder containing .txt files
-            chunk_size: Maximum words per chunk
-            overlap: Words to overlap between chunks
+            index_dir: Folder to save into (defaults to self.index_dir)
+        """
+        index_dir = index_dir or self.index_dir
+        if not index_dir or self.faiss_index is None:
+            return False
+        
+        with self.lock:
+            try:
+                os.makedirs(index_dir, exist_ok=True)
+                
+                self.faiss_index.save(os.path.join(index_dir, "index.faiss"))
+                
+                # Only chunks that made it into the index are saved, pending ones get re-chunked
+                pending = set(self.pending_chunk_ids) | set(self.training_ids)
+                pending_files = self.chunk_store.filenames(pending)
+                self.chunk_store.save(os.path.join(index_dir, "chunks.npy"), exclude_ids=pending)
+                self.bm25_index.save(os.path.join(index_dir, "bm25.npz"), exclude_ids=pending)
+                
+                # Manifest is written last so a crash never leaves a manifest pointing at stale data
+                self._write_json(os.path.join(index_dir, "manifest.json"), {
+                    'version': INDEX_FORMAT_VERSION,
+                    'embedding_model': self.embedding_model_name,
+                    'index_backend': self.faiss_index.name,
+                    'chunk_params': list(self.chunk_params) if self.chunk_params else None,
+                    'chunk_unit': self.chunk_unit,
+                    'files': {
+                        filename: content_hash for filename, content_hash in self.file_hashes.items()
+                        if filename not in pending_files
+                    },
+                    'chunk_files': self.chunk_store.files,
+                    'chunk_names': self.chunk_store.names,
+                    'next_chunk_id': self.next_chunk_id,
+                    'num_chunks': self.faiss_index.ntotal,
+                    'saved_at': datetime.now().isoformat()
+                })
+                
+                print(f"💾 Saved index with {self.faiss_index.ntotal} vectors to: {index_dir}")
+                return True
+            
+            except Exception as e:
+                print(f"❌ Error saving index: {e}")
+                return False
+    
+    def load_index(self, index_dir=None):
+        """
+        Load a previously saved FAISS index and chunks from disk
+        
+        Args:
+            index_dir: Folder to load from (defaults to self.index_dir)
+        
+        Returns:
+            True if an index was loaded
+        """
+        index_dir = index_dir or self.index_dir
+        manifest_path = os.path.join(index_dir, "manifest.json") if index_dir else None
+        
+        if not manifest_path or not os.path.exists(manifest_path):
+            return False
+        
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+            
+            if manifest.get('version') != INDEX_FORMAT_VERSION:
+                print("⚠️ Saved index uses an old format, rebuilding")
+                return False
+            
+            if manifest.get('embedding_model') != self.embedding_model_name:
+                print(f"⚠️ Saved index uses '{manifest.get('embedding_model')}', rebuilding for '{self.embedding_model_name}'")
+                return False
+            
+            if manifest.get('chunk_unit') != self.chunk_unit:
+                print(f"⚠️ Saved index is chunked by {manifest.get('chunk_unit')}, rebuilding with {self.chunk_unit}")
+                return False
+            
+            chunk_store = ChunkStore()
+            chunk_store.load(os.path.join(index_dir, "chunks.npy"), manifest['chunk_files'],
+                             manifest.get('chunk_names'))
+            
+            faiss_index = load_backend(os.path.join(index_dir, "index.faiss"))
+            
+            if faiss_index.ntotal != len(chunk_store):
+                print("⚠️ Saved index and chunks are out of sync, rebuilding")
+                return False
+            
+            # The keyword index is rebuilt from the chunks if it's missing or stale
+            bm25_path = os.path.join(index_dir, "bm25.npz")
+            bm25_index = BM25Index.load(bm25_path) if os.path.exists(bm25_path) else None
+            if bm25_index is None or len(bm25_index) != len(chunk_store):
+                bm25_index = BM25Index()
+                for chunk_id in chunk_store.ids():
+                    bm25_index.add(chunk_id, chunk_store.get_text(chunk_id))
+            
+            self.faiss_index = faiss_index
+            self.chunk_store = chunk_store
+            self.bm25_index = bm25_index
+            self._index_changed()
+            self.next_chunk_id = manifest['next_chunk_id']
+            self.pending_chunk_ids = []
+            self.file_hashes = manifest.get('files', {})
+            self.chunk_params = tuple(manifest['chunk_params']) if manifest.get('chunk_params') else None
+            
+            print(f"📂 Loaded saved {self.faiss_index.name} index: {len(self.file_hashes)} files, {self.faiss_index.ntotal} vectors")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error loading saved index: {e}")
+            return False
+    
+    def _write_json(self, path, data):
+        """Write JSON via a temp file so a crash can't leave a half-written file"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(tmp_path, path)
+    
+    def _file_hash(self, file_path, block_size=1 << 20):
+        """sha256 of a file, read in blocks so big files never sit in memory"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(block_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _describe_file(self, file_path):
+        """Document info kept in self.documents (no file content)"""
+        return {
+            'filename': os.path.basename(file_path),
+            'path': os.path.abspath(file_path),
+            'length': os.path.getsize(file_path)
+        }
+    
+    def _snapshot_path(self, name, content_hash):
+        """Where the index keeps its copy of one version of a document"""
+        folder = hashlib.sha1(f"{name}\n{content_hash}".encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.files_dir, folder, os.path.basename(name))
+    
+    def _snapshot_file(self, file_path, name):
+        """
+        Copy a file into the index folder, its chunks are read from the copy
+        
+        Chunk text is sliced from memory-mapped files, so a source file that
+        is edited in place would return the wrong text, and one rewritten
+        shorter would crash the process with SIGBUS on the next read. Copies
+        are named by content, so the indexed version stays readable while a
+        new one is chunked.
+        
+        Args:
+            file_path: File to copy
+            name: Name the document is indexed under
+        
+        Returns:
+            (copy path, sha256 of the copied content)
+        """
+        os.makedirs(self.files_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.files_dir)
+        os.close(fd)
+        try:
+            shutil.copyfile(file_path, tmp_path)
+            content_hash = self._file_hash(tmp_path)
+            snapshot_path = self._snapshot_path(name, content_hash)
+            if os.path.exists(snapshot_path):
+                # Same content is already there (and may be mapped), keep that copy
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+                os.replace(tmp_path, snapshot_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return snapshot_path, content_hash
+    
+    def _remove_snapshot(self, name, content_hash):
+        """Delete the copy of one version of a document (release its mapping first)"""
+        if content_hash is not None:
+            shutil.rmtree(os.path.dirname(self._snapshot_path(name, content_hash)), ignore_errors=True)
+    
+    def iter_chunk_batches(self, file_paths, chunk_size, overlap, batch_size=256):
+        """
+        Stream chunks of many files in fixed-size batches
+        
+        Args:
+            file_paths: Files to chunk, in order
+            chunk_size: Maximum words (or tokens) per chunk
+            overlap: Words (or tokens) to overlap between chunks
+            batch_size: Chunks per yielded batch
+        
+        Yields:
+            Lists of (file_path, chunk_no, (byte_start, byte_end, char_start))
+        """
+        batch = []
+        for file_path in file_paths:
+            for chunk_no, span in enumerate(self._file_spans(file_path, chunk_size, overlap)):
+                batch.append((file_path, chunk_no, span))
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+    
+    def _file_spans(self, file_path, chunk_size, overlap):
+        """Chunk spans of one file, counted in self.chunk_unit"""
+        return iter_file_spans(file_path, chunk_size, overlap, tokenizer=self.tokenizer)
+    
+    def _limit_chunk_size(self, chunk_size, overlap):
+        """
+        Check the chunk settings and keep token chunks inside the embedding
+        model's window so nothing is truncated
+        """
+        if chunk_size < 1 or overlap < 0 or overlap >= chunk_size:
+            raise ValueError(f"Need chunk_size >= 1 and 0 <= overlap < chunk_size, got "
+                             f"chunk_size={chunk_size}, overlap={overlap}")
+        if self.tokenizer is None:
+            return chunk_size, overlap
+        # [CLS] and [SEP] take two positions of the window
+        max_tokens = self.embedding_model.max_seq_length - 2
+        if chunk_size > max_tokens:
+            print(f"⚠️ {chunk_size} tokens exceed the {self.embedding_model.max_seq_length}-token embedding window, "
+                  f"using {max_tokens}")
+            chunk_size = max_tokens
+            overlap = min(overlap, chunk_size // 2)
+        return chunk_size, overlap
+    
+    def _add_chunks(self, file_path, spans, first_chunk_no=0, name=None):
+        """
+        Register chunks of one file under new stable chunk ids
+        
+        Args:
+            file_path: File the chunks came from
+            spans: List of (byte_start, byte_end, char_start) in file order
+            first_chunk_no: Position of the first chunk in the file (for batched adds)
+            name: Name the document is indexed under (defaults to the filename)
+        
+        Returns:
+            Ids of the chunks, they still need embedding
+        """
+        file_id = self.chunk_store.file_id(file_path, name)
+        data = self.chunk_store.file_data(file_id)
+        new_ids = []
+        
+        for chunk_no, (byte_start, byte_end, char_start) in enumerate(spans, start=first_chunk_no):
+            text = ' '.join(data[byte_start:byte_end].decode('utf-8', errors='replace').split())
+            chunk_id = self.next_chunk_id
+            self.next_chunk_id += 1
+            self.chunk_store.add(chunk_id, file_id, chunk_no, byte_start, byte_end - byte_start,
+                                 char_start, text_hash64(text))
+            self.bm25_index.add(chunk_id, text)
+            new_ids.append(chunk_id)
+        
+        return new_ids
+    
+    def _drop_chunks(self, chunk_ids):
+        """Remove chunks and their vectors by chunk id"""
+        if not chunk_ids:
+            return 0
+        
+        if self.faiss_index is not None:
+            self.faiss_index.remove_ids(np.array(chunk_ids, dtype=np.int64))
+        
+        dropped = set(chunk_ids)
+        self.chunk_store.remove(dropped)
+        self.bm25_index.remove(dropped)
+        self.pending_chunk_ids = [i for i in self.pending_chunk_ids if i not in dropped]
+        if self.training_ids:
+            keep = [row for row, chunk_id in enumerate(self.training_ids) if chunk_id not in dropped]
+            self.training_vectors = [np.vstack(self.training_vectors)[keep]]
+            self.training_ids = [self.training_ids[row] for row in keep]
+        self._index_changed(dropped)
+        return len(dropped)
+    
+    def _index_changed(self, chunk_ids=None):
+        """Bump the index version and drop cached answers built on changed chunks (None = all)"""
+        self.index_version += 1
+        if self.semantic_cache is not None:
+            if chunk_ids is None:
+                self.semantic_cache.clear()
+            else:
+                self.semantic_cache.invalidate_chunks(chunk_ids)
+    
+    def _drop_file_chunks(self, filename):
+        """Remove all chunks (and their vectors) that came from one file"""
+        removed = self._drop_chunks(self.chunk_store.file_chunk_ids(filename))
+        self.chunk_store.release_file(filename)
+        return removed
+    
+    def embed_texts(self, texts, show_progress_bar=False, batch_size=32):
+        """
+        Embed texts, looking them up in the embedding cache first
+        
+        Args:
+            texts: List of chunk texts
+            show_progress_bar: Show the encoder progress bar for cache misses
+            batch_size: Batch size passed to SentenceTransformer.encode
+        
+        Returns:
+            Normalized float32 embeddings, one row per text
+        """
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get_many(self.embedding_model_name, texts)
+        else:
+            cached = [None] * len(texts)
+        miss_rows = [i for i, vector in enumerate(cached) if vector is None]
+        
+        if miss_rows:
+            # Only cache misses go to the embedding model
+            miss_texts = [texts[i] for i in miss_rows]
+            new_embeddings = self.embedding_model.encode(
+                miss_texts,
+                batch_size=batch_size,
+                show_progress_bar=show_progress_bar,
+                convert_to_numpy=True
+            ).astype(np.float32)
+            
+            # Normalize embeddings for cosine similarity
+            faiss.normalize_L2(new_embeddings)
+            
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_many(self.embedding_model_name, miss_texts, new_embeddings)
+            
+            for row, vector in zip(miss_rows, new_embeddings):
+                cached[row] = vector
+        
+        if self.embedding_cache is not None:
+            hits = len(texts) - len(miss_rows)
+            print(f"🗄️ Embedding cache: {hits}/{len(texts)} hits ({hits / len(texts):.0%}), {len(miss_rows)} encoded")
+        
+        return np.vstack(cached).astype(np.float32)
+    
+    def _embed_and_index(self, chunk_ids, show_progress_bar=False, encode_batch_size=32, expected_chunks=None):
+        """Embed the given chunks and add them to the FAISS index under their ids"""
+        if not chunk_ids:
+            return
+        
+        embeddings = self.embed_texts(
+            self.chunk_store.get_texts(chunk_ids),
+            show_progress_bar=show_progress_bar,
+            batch_size=encode_batch_size
+        )
+        self._add_to_index(chunk_ids, embeddings, expected_chunks)
+    
+    def _add_to_index(self, chunk_ids, embeddings, expected_chunks=None):
+        """
+        Add embedded chunks to the FAISS index, creating the index on first use
+        
+        An index that needs training (IVF-PQ) holds the vectors back until
+        it has a full training sample, call _finish_training() once the
+        ingest is done to index a smaller remainder.
+        
+        Args:
+            chunk_ids: Ids of the embedded chunks
+            embeddings: Their vectors
+            expected_chunks: Chunks the index should be sized for (defaults to the chunk store size)
+        """
+        if self.faiss_index is None:
+            # Inner product (cosine similarity) index, type picked by self.index_backend.
+            # Streaming ingests create it on their first batch, so it's sized for the expected total
+            num_vectors = max(expected_chunks or 0, len(self.chunk_store))
+            self.faiss_index = create_backend(self.index_backend, embeddings.shape[1], num_vectors)
+            print(f"🗂️ Using {self.faiss_index.name} index for ~{num_vectors} chunks")
+        
+        pending = set(chunk_ids)
+        self.pending_chunk_ids = [i for i in self.pending_chunk_ids if i not in pending]
+        
+        if not self.faiss_index.is_trained:
+            self.training_ids.extend(chunk_ids)
+            self.training_vectors.append(embeddings)
+            if len(self.training_ids) >= self.faiss_index.training_size:
+                self._finish_training()
+            return
+        
+        self.faiss_index.add_with_ids(embeddings, chunk_ids)
+        self._index_changed(chunk_ids)
+    
+    def _finish_training(self):
+        """Train the index on the held-back vectors and add them (no-op if nothing is held back)"""
+        if not self.training_ids:
+            return
+        chunk_ids = self.training_ids
+        vectors = np.vstack(self.training_vectors)
+        self.training_ids = []
+        self.training_vectors = []
+        
+        if len(chunk_ids) < self.faiss_index.training_size:
+            # Fewer chunks than expected, size the still empty index for what there is
+            self.faiss_index = create_backend(self.faiss_index.name, vectors.shape[1], len(chunk_ids))
+            print(f"🗂️ Using {self.faiss_index.name} index for {len(chunk_ids)} chunks")
+        if not self.faiss_index.is_trained:
+            self.faiss_index.train(vectors)
+        self.faiss_index.add_with_ids(vectors, chunk_ids)
+        self._index_changed(chunk_ids)
+    
+    def _estimate_chunks(self, file_paths, chunk_size, overlap):
+        """Rough number of chunks files will give, from their size (~6 bytes per word, ~4 per token)"""
+        bytes_per_unit = 4 if self.tokenizer is not None else 6
+        total_bytes = sum(os.path.getsize(file_path) for file_path in file_paths)
+        return total_bytes // (bytes_per_unit * (chunk_size - overlap)) + len(file_paths)
+    
+    def _ingest_files(self, file_paths, chunk_size, overlap, batch_size=256, progress_callback=None, names=None,
+                      expected_chunks=None):
+        """
+        Chunk, embed and index files batch by batch
+        
+        Each batch is embedded and added to the index before the next one is
+        read, so memory use depends on batch_size rather than file sizes.
+        The lock is only held to register and insert a batch, never while
+        encoding, so other threads can search what's indexed so far.
+        
+        Args:
+            progress_callback: Optional function(bytes_done, bytes_total) called after each batch
+            names: Optional {file_path: name} for files not indexed under their filename
+            expected_chunks: Size of the whole ingest if these files are only part of it (sizes a new index)
+        
+        Returns:
+            Number of chunks that were embedded
+        """
+        names = names or {}
+        if expected_chunks is None:
+            expected_chunks = len(self.chunk_store) + self._estimate_chunks(file_paths, chunk_size, overlap)
+        total = 0
+        bytes_total = sum(os.path.getsize(file_path) for file_path in file_paths)
+        bytes_before = {}  # file_path -> bytes of the files chunked before it
+        offset = 0
+        for file_path in file_paths:
+            bytes_before[file_path] = offset
+            offset += os.path.getsize(file_path)
+        
+        for batch in self.iter_chunk_batches(file_paths, chunk_size, overlap, batch_size):
+            with self.lock:
+                new_ids = []
+                for file_path, chunk_no, span in batch:
+                    new_ids.extend(self._add_chunks(file_path, [span], first_chunk_no=chunk_no,
+                                                    name=names.get(file_path)))
+                texts = self.chunk_store.get_texts(new_ids)
+            
+            if new_ids:
+                embeddings = self.embed_texts(texts)
+                with self.lock:
+                    self._add_to_index(new_ids, embeddings, expected_chunks)
+            total += len(new_ids)
+            
+            if progress_callback is not None:
+                file_path, _, (_, byte_end, _) = batch[-1]
+                progress_callback(bytes_before[file_path] + byte_end, bytes_total)
+        return total
+    
+    def add_document(self, file_path, chunk_size=None, overlap=None, progress_callback=None, name=None):
+        """
+        Chunk, embed and index a single document
+        
+        A document already indexed under the same name is updated instead.
+        
+        Args:
+            file_path: Path to the .txt file
+            chunk_size: Maximum words (or tokens, see chunk_unit) per chunk (defaults to the current index settings)
+            overlap: Words (or tokens) to overlap between chunks
+            progress_callback: Optional function(bytes_done, bytes_total) called after each batch
+            name: Name to index the document under (defaults to the filename, pass e.g.
+                  the full path to keep files with the same filename apart)
+        
+        Returns:
+            Number of chunks that were embedded
+        """
+        filename = name or os.path.basename(file_path)
+        if filename in self.file_hashes:
+            return self.update_document(file_path, name=filename, progress_callback=progress_callback)
+        
+        with self.lock:
+            chunk_size, overlap = self._resolve_chunk_params(chunk_size, overlap)
+        snapshot_path, content_hash = self._snapshot_file(file_path, filename)
+        
+        try:
+            added = self._ingest_files([snapshot_path], chunk_size, overlap, progress_callback=progress_callback,
+                                       names={snapshot_path: filename})
+        except Exception:
+            # A half-indexed file would stay searchable without a hash, so it could never be updated
+            with self.lock:
+                self._drop_file_chunks(filename)
+                self._remove_snapshot(filename, content_hash)
+            raise
+        
+        with self.lock:
+            self._finish_training()
+            self.documents[filename] = self._describe_file(file_path)
+            self.file_hashes[filename] = content_hash
+        
+        print(f"   ➕ {filename}: {added} chunks added")
+        return added
+    
+    def update_document(self, file_path, name=None, progress_callback=None, batch_size=256):
+        """
+        Re-index a document that changed on disk
+        
+        Chunks whose text is unchanged keep their id and vector, so only
+        edited chunks are embedded and only stale vectors are removed. Like
+        _ingest_files, the new version is chunked and embedded batch by batch
+        without holding the lock: its new chunks are added next to the old
+        version as they're embedded, and the lock is taken once more at the
+        end to swap the two.
+        
+        Args:
+            file_path: Path to the .txt file
+            name: Name the document is indexed under (defaults to the filename)
+            progress_callback: Optional function(bytes_done, bytes_total) called after each batch,
+                               an exception raised by it cancels the update and keeps the old version
+            batch_size: Chunks embedded and indexed at a time
+        
+        Returns:
+            Number of chunks that were embedded
+        """
+        filename = name or os.path.basename(file_path)
+        if filename not in self.file_hashes:
+            return self.add_document(file_path, progress_callback=progress_callback, name=filename)
+        
+        snapshot_path, content_hash = self._snapshot_file(file_path, filename)
+        with self.lock:
+            chunk_size, overlap = self._resolve_chunk_params(None, None)
+            self.documents[filename] = self._describe_file(file_path)
+            
+            old_hash = self.file_hashes.get(filename)
+            if old_hash == content_hash:
+                return 0
+            
+            # Index the old chunks by text hash so identical chunks can be reused
+            old_ids = self.chunk_store.file_chunk_ids(filename)
+            reuse_ids = {}
+            for chunk_id, text_hash in zip(old_ids, self.chunk_store.text_hashes(old_ids)):
+                reuse_ids.setdefault(text_hash, []).append(chunk_id)
+            
+            # Edited chunks are staged under their own name, next to the old version
+            staged_name = f"{filename}\0update"
+            data = self.chunk_store.file_data(self.chunk_store.file_id(snapshot_path, staged_name))
+        
+        expected_chunks = len(self.chunk_store) + self._estimate_chunks([snapshot_path], chunk_size, overlap)
+        bytes_total = os.path.getsize(snapshot_path)
+        moves = []  # (chunk_id, chunk_no, offset, length, start) of unchanged chunks
+        added = 0
+        try:
+            for batch in self.iter_chunk_batches([snapshot_path], chunk_size, overlap, batch_size):
+                new_spans = []
+                for _, chunk_no, (byte_start, byte_end, char_start) in batch:
+                    text = ' '.join(data[byte_start:byte_end].decode('utf-8', errors='replace').split())
+                    ids = reuse_ids.get(text_hash64(text))
+                    if ids:
+                        moves.append((ids.pop(), chunk_no, byte_start, byte_end - byte_start, char_start))
+                    else:
+                        new_spans.append((chunk_no, (byte_start, byte_end, char_start)))
+                
+                with self.lock:
+                    new_ids = []
+                    for chunk_no, span in new_spans:
+                        new_ids.extend(self._add_chunks(snapshot_path, [span], first_chunk_no=chunk_no,
+                                                        name=staged_name))
+                    texts = self.chunk_store.get_texts(new_ids)
+                
+                if new_ids:
+                    embeddings = self.embed_texts(texts)
+                    with self.lock:
+                        self._add_to_index(new_ids, embeddings, expected_chunks)
+                added += len(new_ids)
+                
+                if progress_callback is not None:
+                    progress_callback(batch[-1][2][1], bytes_total)
+        except Exception:
+            # The old version is still complete, only the staged chunks go
+            with self.lock:
+                self._drop_file_chunks(staged_name)
+                self.chunk_store.discard_file(staged_name)
+            self._remove_snapshot(filename, content_hash)
+            raise
+        
+        with self.lock:
+            stale_ids = [chunk_id for ids in reuse_ids.values() for chunk_id in ids]
+            self._drop_chunks(stale_ids)
+            self.chunk_store.swap_file(filename, staged_name, moves)
+            self._finish_training()
+            self.file_hashes[filename] = content_hash
+            self._remove_snapshot(filename, old_hash)
+        
+        print(f"   🔄 {filename}: {added} chunks re-embedded, {len(stale_ids)} removed")
+        return added
+    
+    def remove_document(self, filename):
+        """
+        Remove a document and all of its vectors from the index
+        
+        Args:
+            filename: Name the file is indexed under (a path is reduced to its filename
+                      unless the document was indexed under that path)
+        
+        Returns:
+            Number of chunks removed
+        """
+        with self.lock:
+            if filename not in self.file_hashes:
+                filename = os.path.basename(filename)
+            removed = self._drop_file_chunks(filename)
+            self.documents.pop(filename, None)
+            self._remove_snapshot(filename, self.file_hashes.pop(filename, None))
+            
+            print(f"   🗑️ {filename}: removed ({removed} chunks)")
+            return removed
+    
+    def _resolve_chunk_params(self, chunk_size, overlap):
+        """Fall back to the chunk settings the index was built with"""
+        default_size, default_overlap = self.chunk_params or (500, 50)
+        chunk_size = chunk_size or default_size
+        overlap = default_overlap if overlap is None else overlap
+        chunk_size, overlap = self._limit_chunk_size(chunk_size, overlap)
+        if self.chunk_params is None:
+            self.chunk_params = (chunk_size, overlap)
+        return chunk_size, overlap
+    
+    def _sync_folder(self, folder_path, chunk_size, overlap):
+        """
+        Compare a folder with the index and drop stale chunks
+        
+        Returns:
+            List of (copy path, content_hash) for new or changed files (the
+            copies keep the filename), or None if the folder has no .txt files
         """
         print(f"\n📁 Loading documents from: {folder_path}")
         
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
             print(f"❌ Created folder '{folder_path}' - Please add some .txt files!")
-            return False
+            return None
         
         txt_files = [f for f in os.listdir(folder_path) if f.endswith('.txt')]
         
         if not txt_files:
             print("❌ No .txt files found! Please add some text documents.")
-            return False
+            return None
+        
+        # Chunks built with different settings can't be reused
+        if self.chunk_params is not None and self.chunk_params != (chunk_size, overlap):
+            print("⚠️ Chunk settings changed, re-chunking all documents")
+            self.chunk_store.clear()
+            self.bm25_index.clear()
+            self.pending_chunk_ids = []
+            self.faiss_index = None
+            for filename, content_hash in self.file_hashes.items():
+                self._remove_snapshot(filename, content_hash)
+            self.file_hashes = {}
+            self._index_changed()
+        self.chunk_params = (chunk_size, overlap)
         
-        total_chunks = 0
+        # Forget files that were deleted since the index was saved
+        for filename in list(self.file_hashes):
+            if filename not in txt_files:
+                self.remove_document(filename)
+        
+        changed = []
         
         for filename in txt_files:
             file_path = os.path.join(folder_path, filename)
             
             try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    content = file.read()
+                content_hash = self._file_hash(file_path)
+                self.documents[filename] = self._describe_file(file_path)
                 
-                self.documents.append({
-                    'filename': filename,
-                    'content': content,
-                    'length': len(content)
-                })
+                if self.file_hashes.get(filename) == content_hash:
+                    # Chunk text comes from the index's copy, so a moved folder needs no update
+                    print(f"   📄 {filename}: {len(self.chunk_store.file_chunk_ids(filename))} chunks (unchanged)")
+                    continue
                 
-                # Split into chunks with overlap
-                file_chunks = self._split_into_chunks(content, chunk_size, overlap)
+                # File is new or changed - drop its old chunks and copy before re-chunking a new copy
+                self._drop_file_chunks(filename)
+                self._remove_snapshot(filename, self.file_hashes.pop(filename, None))
+                changed.append(self._snapshot_file(file_path, filename))
                 
-                # Add metadata for each chunk
-                for i, chunk in enumerate(file_chunks):
-                    self.chunks.append(chunk)
-                    self.chunk_metadata.append({
-                        'filename': filename,
-                        'chunk_id': i,
-                        'chunk_start': i * (chunk_size - overlap),
-                        'chunk_length': len(chunk)
-                    })
+            except Exception as e:
+                print(f"❌ Error loading {filename}: {e}")
+        
+        return changed
+    
+    def load_documents_from_folder(self, folder_path="documents", chunk_size=500, overlap=50):
+        """
+        Load all .txt files from folder and split into chunks
+        
+        Args:
+            folder_path: Path to folder containing .txt files
+            chunk_size: Maximum words (or tokens, see chunk_unit) per chunk
+            overlap: Words (or tokens) to overlap between chunks
+        """
+        chunk_size, overlap = self._limit_chunk_size(chunk_size, overlap)
+        changed = self._sync_folder(folder_path, chunk_size, overlap)
+        if changed is None:
+            return False
+        
+        for file_path, content_hash in changed:
+            filename = os.path.basename(file_path)
+            try:
+                # Add metadata for each chunk, embedding happens in create_embeddings_and_index
+                for batch in self.iter_chunk_batches([file_path], chunk_size, overlap):
+                    self.pending_chunk_ids.extend(self._add_chunks(
+                        file_path, [span for _, _, span in batch], first_chunk_no=batch[0][1]
+                    ))
+                self.file_hashes[filename] = content_hash
+                print(f"   📄 {filename}: {len(self.chunk_store.file_chunk_ids(filename))} chunks")
                 
-                total_chunks += len(file_chunks)
-                print(f"   📄 {filename}: {len(file_chunks)} chunks")
+            except Exception as e:
+                self._drop_file_chunks(filename)
+                self._remove_snapshot(filename, content_hash)
+                print(f"❌ Error loading {filename}: {e}")
+        
+        print(f"✅ Loaded {len(self.documents)} documents, {len(self.chunk_store)} chunks total")
+        return True
+    
+    def ingest_documents(self, folder_path="documents", chunk_size=500, overlap=50, batch_size=256):
+        """
+        Streaming version of load_documents_from_folder + create_embeddings_and_index
+        
+        Files are read incrementally and chunks go to the embedder in batches
+        of batch_size, so peak memory is bounded by the batch, not the corpus.
+        
+        Args:
+            folder_path: Path to folder containing .txt files
+            chunk_size: Maximum words (or tokens, see chunk_unit) per chunk
+            overlap: Words (or tokens) to overlap between chunks
+            batch_size: Chunks embedded and indexed at a time
+        """
+        indexed_files = dict(self.file_hashes)
+        chunk_size, overlap = self._limit_chunk_size(chunk_size, overlap)
+        changed = self._sync_folder(folder_path, chunk_size, overlap)
+        if changed is None:
+            return False
+        
+        # A new index is sized for every changed file, not just the first one
+        expected_chunks = len(self.chunk_store) + self._estimate_chunks([path for path, _ in changed], chunk_size,
+                                                                        overlap)
+        for file_path, content_hash in changed:
+            filename = os.path.basename(file_path)
+            try:
+                added = self._ingest_files([file_path], chunk_size, overlap, batch_size,
+                                           expected_chunks=expected_chunks)
+                self.file_hashes[filename] = content_hash
+                print(f"   📄 {filename}: {added} chunks embedded")
                 
             except Exception as e:
+                self._drop_file_chunks(filename)
+                self._remove_snapshot(filename, content_hash)
                 print(f"❌ Error loading {filename}: {e}")
         
-        print(f"✅ Loaded {len(self.documents)} documents, {total_chunks} chunks total")
+        self._finish_training()
+        if self.faiss_index is None:
+            print("❌ No chunks to embed! Please add some text to the documents.")
+            return False
+        
+        print(f"✅ Indexed {len(self.documents)} documents, {self.faiss_index.ntotal} vectors total")
+        if self.file_hashes != indexed_files:
+            self.save_index()
         return True
     
-    def _split_into_chunks(self, text, chunk_size, overlap):
-        """Split text into overlapping chunks by words"""
-        words = text.split()
-        chunks = []
+    def ingest_documents_parallel(self, folder_path="documents", chunk_size=500, overlap=50, batch_size=256,
+                                  encode_batch_size=64, num_workers=None, max_queued_batches=8,
+                                  large_file_bytes=64 << 20):
+        """
+        Pipelined version of ingest_documents
         
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk_words = words[i:i + chunk_size]
-            chunk_text = ' '.join(chunk_words)
-            chunks.append(chunk_text)
-            
-            # Break if we've covered all words
-            if i + chunk_size >= len(words):
+        Worker processes read and chunk files while this process embeds the
+        finished batches and adds them to the index. The queue between the
+        two stages is bounded, so chunking never runs far ahead of embedding.
+        
+        Args:
+            folder_path: Path to folder containing .txt files
+            chunk_size: Maximum words (or tokens, see chunk_unit) per chunk
+            overlap: Words (or tokens) to overlap between chunks
+            batch_size: Chunks per queued batch (embedded and indexed together)
+            encode_batch_size: Batch size passed to SentenceTransformer.encode
+            num_workers: Chunking processes (defaults to all cores but one). Only
+                word chunking uses them: with chunk_unit="tokens" (main() and
+                the desktop app) files are tokenized in this process, since
+                the Rust tokenizer already runs on every core
+            max_queued_batches: Batches allowed to wait for the embedder
+            large_file_bytes: Bigger files are streamed instead of chunked in a worker (word chunking only)
+        """
+        indexed_files = dict(self.file_hashes)
+        chunk_size, overlap = self._limit_chunk_size(chunk_size, overlap)
+        changed = self._sync_folder(folder_path, chunk_size, overlap)
+        if changed is None:
+            return False
+        
+        num_workers = num_workers or max(1, (os.cpu_count() or 2) - 1)
+        content_hashes = dict(changed)
+        expected_chunks = len(self.chunk_store) + self._estimate_chunks(list(content_hashes), chunk_size, overlap)
+        batches = queue.Queue(maxsize=max_queued_batches)
+        
+        producer = threading.Thread(
+            target=self._produce_chunk_batches,
+            args=(list(content_hashes), chunk_size, overlap, batch_size, num_workers, large_file_bytes, batches),
+            daemon=True
+        )
+        
+        print(f"⚙️ Ingesting {len(changed)} files with {num_workers} chunking workers")
+        start_time = time.perf_counter()
+        embedded = 0
+        producer.start()
+        
+        while True:
+            item = batches.get()
+            if item is None:
                 break
+            
+            file_path, first_chunk_no, spans, is_last, error = item
+            filename = os.path.basename(file_path)
+            
+            if error is not None:
+                with self.lock:
+                    self._drop_file_chunks(filename)
+                    self._remove_snapshot(filename, content_hashes[file_path])
+                print(f"❌ Error loading {filename}: {error}")
+                continue
+            
+            # Like _ingest_files, the lock is held to register and insert a batch but not while encoding
+            with self.lock:
+                new_ids = self._add_chunks(file_path, spans, first_chunk_no=first_chunk_no)
+                texts = self.chunk_store.get_texts(new_ids)
+            
+            # FAISS insertion happens as soon as each batch is embedded
+            if new_ids:
+                embeddings = self.embed_texts(texts, batch_size=encode_batch_size)
+                with self.lock:
+                    self._add_to_index(new_ids, embeddings, expected_chunks)
+            embedded += len(new_ids)
+            
+            if is_last:
+                with self.lock:
+                    self.file_hashes[filename] = content_hashes[file_path]
+                elapsed = time.perf_counter() - start_time
+                print(f"   📄 {filename}: {len(self.chunk_store.file_chunk_ids(filename))} chunks "
+                      f"({embedded / elapsed:.0f} chunks/s so far)")
+        
+        producer.join()
+        with self.lock:
+            self._finish_training()
+        elapsed = time.perf_counter() - start_time
+        
+        if self.faiss_index is None:
+            print("❌ No chunks to embed! Please add some text to the documents.")
+            return False
+        
+        print(f"⚡ Embedded {embedded} chunks in {elapsed:.1f}s ({embedded / max(elapsed, 1e-9):.0f} chunks/s)")
+        print(f"✅ Indexed {len(self.documents)} documents, {self.faiss_index.ntotal} vectors total")
+        if self.file_hashes != indexed_files:
+            self.save_index()
+        return True
+    
+    def _produce_chunk_batches(self, file_paths, chunk_size, overlap, batch_size, num_workers,
+                               large_file_bytes, batches):
+        """
+        Producer side of ingest_documents_parallel (runs in a background thread)
         
-        return chunks
+        Puts (file_path, first_chunk_no, spans, is_last_batch, error) items on
+        the batches queue, followed by None when everything is chunked.
+        """
+        def put_file(file_path, spans):
+            batch = []
+            chunk_no = 0
+            for span in spans:
+                batch.append(span)
+                if len(batch) == batch_size:
+                    batches.put((file_path, chunk_no, batch, False, None))
+                    chunk_no += len(batch)
+                    batch = []
+            batches.put((file_path, chunk_no, batch, True, None))
+        
+        try:
+            if self.tokenizer is not None:
+                # The Rust tokenizer already uses every core, so token chunking stays in this thread
+                small_files = []
+                large_files = list(file_paths)
+            else:
+                small_files = [p for p in file_paths if os.path.getsize(p) < large_file_bytes]
+                large_files = [p for p in file_paths if os.path.getsize(p) >= large_file_bytes]
+            
+            if small_files:
+                for file_path, spans, error in chunk_files_parallel(small_files, chunk_size, overlap, num_workers):
+                    if error is not None:
+                        batches.put((file_path, 0, [], True, error))
+                    else:
+                        put_file(file_path, spans)
+            
+            # Huge files would make a worker return a giant span list, so they are streamed here
+            for file_path in large_files:
+                try:
+                    put_file(file_path, self._file_spans(file_path, chunk_size, overlap))
+                except Exception as e:
+                    batches.put((file_path, 0, [], True, e))
+        
+        finally:
+            batches.put(None)
     
-    def create_embeddings_and_index(self):
+    def create_embeddings_and_index(self, batch_size=1024):
         """
         Create embeddings for all chunks and build FAISS index
+        
+        Args:
+            batch_size: Chunks embedded per encode call
         """
-        if not self.chunks:
+        if not len(self.chunk_store):
             print("❌ No chunks to embed! Load documents first.")
             return False
         
-        print(f"\n🧮 Creating embeddings for {len(self.chunks)} chunks...")
+        # Chunks that are already in the index (loaded from disk) keep their vectors
+        if not self.pending_chunk_ids:
+            print(f"\n✅ FAISS index is up to date ({self.faiss_index.ntotal} vectors), nothing to embed")
+            return True
+        
+        indexed = self.faiss_index.ntotal if self.faiss_index is not None else 0
+        print(f"\n🧮 Creating embeddings for {len(self.pending_chunk_ids)} chunks ({indexed} reused from saved index)...")
         
         try:
-            # Create embeddings
-            embeddings = self.embedding_model.encode(
-                self.chunks, 
-                show_progress_bar=True,
-                convert_to_numpy=True
-            )
-            
-            print(f"✅ Embeddings shape: {embeddings.shape}")
-            
-            # Normalize embeddings for cosine similarity
-            faiss.normalize_L2(embeddings)
-            
-            # Create FAISS index
-            dimension = embeddings.shape[1]
-            self.faiss_index = faiss.IndexFlatIP(dimension)  # Inner product (cosine similarity)
-            self.faiss_index.add(embeddings)
+            # Embed in batches so only one batch of vectors is in flight at a time
+            pending = list(self.pending_chunk_ids)
+            for start in range(0, len(pending), batch_size):
+                self._embed_and_index(pending[start:start + batch_size], show_progress_bar=True)
+            self._finish_training()
             
             print(f"✅ FAISS index created with {self.faiss_index.ntotal} vectors")
+            
+            self.save_index()
             return True
             
         except Exception as e:
             print(f"❌ Error creating embeddings: {e}")
             return False
     
-    def retrieve_relevant_chunks(self, query, top_k=3):
+    def retrieve_relevant_chunks(self, query, top_k=3, hybrid=None, **search_params):
         """
-        Retrieve most relevant chunks for a query using FAISS
+        Retrieve most relevant chunks for a query using FAISS (and BM25)
         
         Args:
             query: Search query
             top_k: Number of chunks to retrieve
+            hybrid: Fuse with BM25 keyword results (defaults to self.hybrid_search)
+            search_params: Per-query index tuning (ef_search for hnsw, nprobe for ivfpq)
         
         Returns:
             List of relevant chunks with metadata
         """
-        if self.faiss_index is None:
+        return self.retrieve_relevant_chunks_batch([query], top_k, hybrid, **search_params)[0]
+    
+    def retrieve_relevant_chunks_batch(self, queries, top_k=3, hybrid=None, **search_params):
+        """
+        Retrieve relevant chunks for many queries with one encode and one search call
+        
+        In hybrid mode both FAISS and BM25 return a deeper candidate list
+        and the two rankings are merged with reciprocal rank fusion, so
+        exact terms (names, IDs) are found even when embeddings miss them.
+        'score' is then the fused score and 'dense_score' the cosine
+        similarity (None for keyword-only hits).
+        
+        Args:
+            queries: List of search queries
+            top_k: Number of chunks to retrieve per query
+            hybrid: Fuse with BM25 keyword results (defaults to self.hybrid_search)
+            search_params: Index tuning (ef_search for hnsw, nprobe for ivfpq)
+        
+        Returns:
+            One list of relevant chunks per query, same format as retrieve_relevant_chunks
+        """
+        if self.faiss_index is None or not self.faiss_index.is_trained:
             print("❌ No FAISS index found! Create embeddings first.")
+            return [[] for _ in queries]
+        
+        if not queries:
             return []
         
-        try:
-            # Embed the query
-            query_embedding = self.embedding_model.encode([query])
-            faiss.normalize_L2(query_embedding)
-            
-            # Search FAISS index
-            scores, indices = self.faiss_index.search(query_embedding, top_k)
-            
-            # Gather results
-            results = []
-            for i, (score, idx) in enumerate(zip(scores[0], indices[0])):
-                if idx != -1:  # Valid result
-                    results.append({
-                        'chunk': self.chunks[idx],
-                        'metadata': self.chunk_metadata[idx],
-                        'score': float(score),
-                        'rank': i + 1
-                    })
-            
-            return results
+        hybrid = self.hybrid_search if hybrid is None else hybrid
+        num_candidates = max(top_k * 4, 20) if hybrid else top_k
+        
+        with self.lock:
+            try:
+                # Embed all queries in one batch (repeated questions come from the query cache)
+                query_embeddings = self.embed_queries(queries)
+                
+                # Search FAISS index with the whole query matrix
+                scores, indices = self.faiss_index.search(query_embeddings, num_candidates, **search_params)
+                
+                results = []
+                for query, row_scores, row_indices in zip(queries, scores, indices):
+                    dense_hits = [(int(idx), float(score)) for score, idx in zip(row_scores, row_indices) if idx != -1]
+                    if not hybrid:
+                        results.append(self._gather_results(dense_hits))
+                        continue
+                    
+                    keyword_ids = [chunk_id for chunk_id, _ in self.bm25_index.search(query, num_candidates)]
+                    fused = reciprocal_rank_fusion([[idx for idx, _ in dense_hits], keyword_ids], top_k=top_k)
+                    results.append(self._gather_results(fused, dense_scores=dict(dense_hits)))
+                return results
             
-        except Exception as e:
-            print(f"❌ Error retrieving chunks: {e}")
+            except Exception as e:
+                print(f"❌ Error retrieving chunks: {e}")
+                return [[] for _ in queries]
+    
+    def embed_queries(self, queries):
+        """
+        Embed queries, skipping the embedding model for recently seen ones
+        
+        Args:
+            queries: List of query strings
+        
+        Returns:
+            Normalized float32 query embeddings, one row per query
+        """
+        keys = [normalize_text(query) for query in queries]
+        vectors = [self.query_cache.get(key) for key in keys]
+        
+        # Duplicate queries in one batch are only encoded (and counted as a miss) once
+        misses = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        self.query_cache_hits += len(keys) - len(misses)
+        self.query_cache_misses += len(misses)
+        
+        for key in keys:
+            if key in self.query_cache:
+                self.query_cache.move_to_end(key)
+        
+        if misses:
+            new_embeddings = self.embedding_model.encode(misses, convert_to_numpy=True).astype(np.float32)
+            faiss.normalize_L2(new_embeddings)
+            encoded = dict(zip(misses, new_embeddings))
+            vectors = [encoded[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+            
+            if self.query_cache_size > 0:
+                self.query_cache.update(encoded)
+                while len(self.query_cache) > self.query_cache_size:
+                    self.query_cache.popitem(last=False)
+        
+        return np.vstack(vectors).astype(np.float32)
+    
+    def _gather_results(self, hits, dense_scores=None):
+        """Turn ranked (chunk id, score) pairs into result dicts"""
+        results = []
+        for i, (idx, score) in enumerate(hits):
+            text = self.chunk_store.get_text(idx)
+            result = {
+                'id': idx,
+                'chunk': text,
+                'metadata': self.chunk_store.get_metadata(idx, text),
+                'score': score,
+                'rank': i + 1
+            }
+            if dense_scores is not None:
+                result['dense_score'] = dense_scores.get(idx)
+            results.append(result)
+        return results
+    
+    def report_index_recall(self, top_k=10, num_queries=200, backends=None):
+        """
+        Compare every index backend against exact flat search on the current chunks
+        
+        Args:
+            top_k: k for recall@k
+            num_queries: Number of sampled queries (noisy copies of indexed chunks)
+            backends: Backend names to test (defaults to all)
+        
+        Returns:
+            List of report dicts, one per backend and search setting
+        """
+        pending = set(self.pending_chunk_ids) | set(self.training_ids)
+        chunk_ids = [i for i in self.chunk_store.ids() if i not in pending]
+        if not chunk_ids:
+            print("❌ No indexed chunks to evaluate")
             return []
+        
+        print(f"\n📏 Measuring recall@{top_k} on {len(chunk_ids)} vectors...")
+        
+        # Vectors come from the embedding cache, so this doesn't re-run the model
+        vectors = self.embed_texts(self.chunk_store.get_texts(chunk_ids))
+        ids = np.array(chunk_ids, dtype=np.int64)
+        
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)
+        queries = vectors[sample] + rng.normal(0, 0.05, size=(len(sample), vectors.shape[1])).astype(np.float32)
+        faiss.normalize_L2(queries)
+        
+        settings = {
+            'flat': [{}],
+            'hnsw': [{'ef_search': ef} for ef in (16, 64, 256)],
+            'ivfpq': [{'nprobe': nprobe} for nprobe in (4, 16, 64)],
+        }
+        
+        reports = []
+        for name in backends or BACKENDS:
+            backend = create_backend(name, vectors.shape[1], len(vectors))
+            if not backend.is_trained:
+                backend.train(vectors)
+            backend.add_with_ids(vectors, ids)
+            
+            for params in settings.get(backend.name, [{}]):
+                report = recall_report(backend, vectors, ids, queries, top_k, **params)
+                reports.append(report)
+                print(f"   {backend.name:6} {str(params):20} recall@{top_k}: {report[f'recall@{top_k}']:.3f}  "
+                      f"p50: {report['p50_ms']:.2f} ms  p99: {report['p99_ms']:.2f} ms  "
+                      f"(exact p99: {report['exact_p99_ms']:.2f} ms)")
+        
+        return reports
     
     def generate_rag_response(self, question, retrieved_chunks):
         """
@@ -220,18 +1268,15 @@ Answer:"""
 
         try:
             # Generate response with TinyLlama
-            response = ollama.generate(
-                model=self.model_name,
+            response = self.llm.generate(
                 prompt=prompt,
-                options={
-                    'temperature': 0.3,  # Lower temperature for factual responses
-                    'top_p': 0.9,
-                    'max_tokens': 500,
-                    'stop': ['Question:', 'Context:']  # Stop tokens
-                }
+                temperature=0.3,  # Lower temperature for factual responses
+                top_p=0.9,
+                max_tokens=500,
+                stop=['Question:', 'Context:']  # Stop tokens
             )
             
-            return response['response'].strip()
+            return response.strip()
             
         except Exception as e:
             print(f"❌ Error generating response: {e}")
@@ -250,6 +1295,15 @@ Answer:"""
             Response with sources
         """
         print(f"\n❓ Question: {question}")
+        
+        # A differently worded question that was answered before skips retrieval and the LLM
+        cached = self._cached_answer(question, top_k)
+        if cached is not None:
+            if show_sources:
+                print(f"⚡ Answered from cache ({cached['similarity']:.2f} similar to: {cached['similar_question']})")
+            return cached
+        index_version = self.index_version
+        
         print("🔍 Searching for relevant information...")
         
         # Retrieve relevant chunks
@@ -264,6 +1318,19 @@ Answer:"""
         print("🤖 Generating answer...")
         response = self.generate_rag_response(question, retrieved_chunks)
         
+        # AIModel reports failures as "Error: ..." text, those are not worth keeping
+        if self.semantic_cache is not None and retrieved_chunks and not response.startswith(("Error:", "Sorry,")):
+            # Hybrid results also carry their cosine similarity, a cache hit returns the same shape
+            dense_scores = None
+            if 'dense_score' in retrieved_chunks[0]:
+                dense_scores = {chunk['id']: chunk['dense_score'] for chunk in retrieved_chunks}
+            with self.lock:
+                self.semantic_cache.add(
+                    self.embed_queries([question])[0], question, response,
+                    [(chunk['id'], chunk['score']) for chunk in retrieved_chunks], index_version, self.model_name, top_k,
+                    dense_scores=dense_scores
+                )
+        
         return {
             'question': question,
             'answer': response,
@@ -271,13 +1338,36 @@ Answer:"""
             'timestamp': datetime.now().isoformat()
         }
     
+    def _cached_answer(self, question, top_k):
+        """Look a question up in the semantic cache, returns an ask_question result or None"""
+        if self.semantic_cache is None or self.faiss_index is None:
+            return None
+        
+        with self.lock:
+            hit = self.semantic_cache.lookup(self.embed_queries([question])[0], self.index_version,
+                                             self.model_name, top_k)
+            if hit is None:
+                return None
+            entry, similarity = hit
+            sources = self._gather_results(entry['sources'], dense_scores=entry['dense_scores'])
+        
+        return {
+            'question': question,
+            'answer': entry['answer'],
+            'sources': sources,
+            'cached': True,
+            'similar_question': entry['question'],
+            'similarity': similarity,
+            'timestamp': datetime.now().isoformat()
+        }
+    
     def interactive_chat(self):
         """
         Start interactive chat session
         """
         print("\n💬 TinyLlama RAG Chat Started!")
         print("Ask questions about your documents. Type 'quit' to exit.")
-        print("Commands: 'sources' = toggle source display, 'stats' = show statistics")
+        print("Commands: 'sources' = toggle source display, 'stats' = show statistics, 'recall' = index recall report")
         
         show_sources = True
         
@@ -298,6 +1388,10 @@ Answer:"""
                     self._show_stats()
                     continue
                 
+                elif user_input.lower() == 'recall':
+                    self.report_index_recall()
+                    continue
+                
                 elif not user_input:
                     continue
                 
@@ -320,8 +1414,22 @@ Answer:"""
         """Show system statistics"""
         print(f"\n📊 RAG System Statistics:")
         print(f"   Documents loaded: {len(self.documents)}")
-        print(f"   Total chunks: {len(self.chunks)}")
+        print(f"   Total chunks: {len(self.chunk_store)} ({self.chunk_store.nbytes() / 1024:.0f} KB chunk table)")
         print(f"   FAISS index size: {self.faiss_index.ntotal if self.faiss_index else 0}")
+        print(f"   Index type: {self.faiss_index.name if self.faiss_index else self.index_backend}")
+        print(f"   Keyword index: {len(self.bm25_index)} chunks, {self.bm25_index.num_terms} terms")
+        print(f"   Query cache: {len(self.query_cache)}/{self.query_cache_size} queries, "
+              f"{self.query_cache_hits} hits, {self.query_cache_misses} misses")
+        if self.embedding_cache is not None:
+            print(f"   Embedding cache: {len(self.embedding_cache)} vectors, "
+                  f"{self.embedding_cache.hit_rate:.0%} hit rate ({self.embedding_cache.hits} hits, {self.embedding_cache.misses} misses)")
+        if self.semantic_cache is not None:
+            print(f"   Answer cache: {len(self.semantic_cache)} answers, {self.semantic_cache.hits} hits, "
+                  f"{self.semantic_cache.misses} misses (similarity >= {self.semantic_cache.threshold})")
+        if self.llm.cache is not None:
+            stats = self.llm.cache.stats()
+            print(f"   Response cache: {stats['memory_entries']} in memory, {stats['hit_rate']:.0%} hit rate "
+                  f"({stats['hits']} hits, {stats['disk_hits']} from disk, {stats['misses']} misses)")
         print(f"   Model: {self.model_name}")
 
 def main():
@@ -331,17 +1439,41 @@ def main():
     print("🚀 TinyLlama RAG System")
     print("=" * 50)
     
+    # --profile-startup [report.json] writes a timing report after indexing and exits
+    profile_path = profile_path_from_argv(sys.argv)
+    profiler = STARTUP_PROFILER
+    
     # Initialize RAG system
-    rag = TinyLlamaRAG(model_name="tinyllama")  # Change to "gemma:2b" if preferred
+    # Chunks are sized in embedding tokens so none get truncated by the 256-token window
+    # Answers are generated at temperature 0.3, so repeated questions are served from the response cache
+    with profiler.phase("model load"):
+        llm = AIModel("tinyllama", cache=ResponseCache(db_path=os.path.join("rag_index", "responses.db")),
+                      cache_max_temperature=0.3)  # Change to "gemma:2b" if preferred
+        rag = TinyLlamaRAG(chunk_unit="tokens", llm=llm)
     
-    # Load documents
-    if not rag.load_documents_from_folder("documents"):
-        print("Please add .txt files to the 'documents' folder and run again!")
+    # Reuse the saved index so only new or changed files get embedded
+    with profiler.phase("index load"):
+        rag.load_index()
+    
+    # Stream documents into the index (only new or changed files are embedded)
+    profiler.instrument(rag, "embed_texts", "embedding")
+    profiler.instrument(rag, "_add_to_index", "index build")
+    profiler.instrument(rag, "save_index", "index save")
+    with profiler.phase("document ingest"):
+        ingested = rag.ingest_documents("documents", chunk_size=200, overlap=40)
+    
+    if profile_path:
+        # Whatever ingest time isn't embedding, indexing or saving went to reading and chunking files
+        ingest = profiler.phases[-1]['duration_s']
+        profiler.add_time("document load", max(ingest - sum(
+            profiler.summed(name) for name in ("embedding", "index build", "index save")
+        ), 0.0))
+        profiler.stop_import_tracking()
+        profiler.write(profile_path)
         return
     
-    # Create embeddings and index
-    if not rag.create_embeddings_and_index():
-        print("Failed to create embeddings. Please check your setup.")
+    if not ingested:
+        print("Please add .txt files to the 'documents' folder and run again!")
         return
     
     print("\n✅ RAG System Ready!")
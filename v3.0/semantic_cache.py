@@ -0,0 +1,108 @@
+import faiss
+import numpy as np
+
+
+class SemanticCache:
+    def __init__(self, dim, threshold=0.92, max_entries=512):
+        """
+        Answer cache keyed by question meaning instead of exact text
+
+        Question embeddings go into a small inner product FAISS index, so
+        "what does X do?" and "what is X for?" can share one answer. An
+        entry is only served while the RAG index is at the version it was
+        answered against, and is dropped as soon as one of its source
+        chunks is re-indexed or removed.
+
+        Args:
+            dim: Embedding dimension (questions must be L2 normalized)
+            threshold: Minimum cosine similarity for a hit
+            max_entries: Oldest answers are evicted above this size
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.index = faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+        self.entries = {}  # entry id -> answer, chunk ids, versions (insertion order = age)
+        self.next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, query_vector, index_version, model_name, top_k):
+        """
+        Find a cached answer for a question
+
+        Args:
+            query_vector: Normalized question embedding
+            index_version: Current version of the RAG index
+            model_name: LLM the answer has to come from
+            top_k: Number of sources the answer has to be based on
+
+        Returns:
+            (entry dict, similarity), or None on a miss
+        """
+        if self.entries:
+            scores, ids = self.index.search(self._as_matrix(query_vector), min(8, len(self.entries)))
+            stale = []
+            for score, entry_id in zip(scores[0], ids[0]):
+                if entry_id == -1 or score < self.threshold:
+                    break
+                entry = self.entries[int(entry_id)]
+                if entry['index_version'] != index_version:
+                    stale.append(int(entry_id))
+                    continue
+                if entry['model_name'] == model_name and entry['top_k'] == top_k:
+                    self._remove(stale)
+                    self.hits += 1
+                    return entry, float(score)
+            self._remove(stale)
+
+        self.misses += 1
+        return None
+
+    def add(self, query_vector, question, answer, sources, index_version, model_name, top_k, dense_scores=None):
+        """
+        Cache an answer
+
+        Args:
+            sources: (chunk id, score) pairs the answer was generated from
+            dense_scores: {chunk id: cosine similarity} of hybrid results (None if not hybrid)
+        """
+        entry_id = self.next_id
+        self.next_id += 1
+        self.index.add_with_ids(self._as_matrix(query_vector), np.array([entry_id], dtype=np.int64))
+        self.entries[entry_id] = {
+            'question': question,
+            'answer': answer,
+            'sources': list(sources),
+            'dense_scores': dense_scores,
+            'chunk_ids': {chunk_id for chunk_id, _ in sources},
+            'index_version': index_version,
+            'model_name': model_name,
+            'top_k': top_k
+        }
+
+        if len(self.entries) > self.max_entries:
+            self._remove(list(self.entries)[:len(self.entries) - self.max_entries])
+
+    def invalidate_chunks(self, chunk_ids):
+        """Drop answers that were built from any of these chunks"""
+        chunk_ids = set(chunk_ids)
+        self._remove([entry_id for entry_id, entry in self.entries.items()
+                      if not chunk_ids.isdisjoint(entry['chunk_ids'])])
+
+    def clear(self):
+        self.index.reset()
+        self.entries = {}
+
+    def _remove(self, entry_ids):
+        if not entry_ids:
+            return
+        self.index.remove_ids(np.array(entry_ids, dtype=np.int64))
+        for entry_id in entry_ids:
+            del self.entries[entry_id]
+
+    @staticmethod
+    def _as_matrix(vector):
+        return np.ascontiguousarray(np.asarray(vector, dtype=np.float32).reshape(1, -1))